@@ -0,0 +1,98 @@
+"""Checks that the GUI, profile and reader modules start fast and never load the inference stack.
+
+Usage (from the repository root):
+
+    python -m benchmarks.import_time [--budget-ms 1500] [--repeat 3]
+
+Each module is imported in a fresh interpreter under `python -X importtime`. The script
+reports the cumulative import time and the slowest top-level dependencies, and exits with
+status 1 if any module imports torch/ultralytics or takes longer than the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must stay light: everything loaded before a camera's worker starts
+LIGHT_MODULES = [
+    "main",
+    "gui.start_screen",
+    "gui.main_window",
+    "utils.profile_manager",
+    "core.pipeline",
+    "core.camera_reader",
+    "core.reader_pool",
+]
+FORBIDDEN_PACKAGES = ("torch", "ultralytics", "torchvision")
+DEFAULT_BUDGET_MS = 1500
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module):
+    """Imports a module in a fresh interpreter.
+
+    Returns (total us, {dependency: cumulative us} of its direct imports, set of every root package
+    imported, error line or None). Interpreter startup (site, encodings) is not counted.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    root = module.split(".")[0]
+    total = 0
+    dependencies = {}
+    packages = set()
+    children = {} # importtime lists nested imports before their parent
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2 # Nested imports are indented under their parent
+        name = name.strip()
+        packages.add(name.split(".")[0])
+        if depth == 0:
+            if name.split(".")[0] == root:
+                total += int(cumulative)
+                dependencies.update(children)
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative)
+    error = proc.stderr.strip().splitlines()[-1] if proc.returncode else None
+    return total, dependencies, packages, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum import time per module")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest is reported")
+    parser.add_argument("--top", type=int, default=3, help="Slowest dependencies to show per module")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<24}{'ms':>9}  slowest imports")
+    for module in LIGHT_MODULES:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        errors = [error for _, _, _, error in runs if error]
+        if errors:
+            print(f"{module:<24}{'error':>9}  {errors[0]}")
+            failures.append(f"{module} failed to import: {errors[0]}")
+            continue
+        total, dependencies, packages, _ = min(runs, key=lambda run: run[0])
+        total_ms = total / 1000
+        slowest = sorted(dependencies.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{module:<24}{total_ms:>9.1f}  " + ", ".join(f"{name} {us / 1000:.0f}" for name, us in slowest))
+
+        forbidden = sorted(packages.intersection(FORBIDDEN_PACKAGES))
+        if forbidden:
+            failures.append(f"{module} imports {', '.join(forbidden)}")
+        if total_ms > args.budget_ms:
+            failures.append(f"{module} takes {total_ms:.0f} ms to import (budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\nStartup check failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nAll modules within {args.budget_ms:.0f} ms and free of {', '.join(FORBIDDEN_PACKAGES)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Compares per-process readers against pooled reader threads.
+
+Usage (from the repository root):
+
+    python -m benchmarks.reader_executor --sources 32 --sources-per-process 8 --duration 20
+
+Each source is a synthetic 30 fps video file read through the normal camera_reader, which
+plays files back at their own frame rate, so every source behaves like a live camera. For both
+modes the script reports delivered frame rate, CPU time per frame, the combined RSS of the
+reader processes and the jitter of frame notification intervals. The run fails if any reader
+stops (end of file or error) before the measurement window closes.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import queue as _queue
+
+import cv2
+import numpy as np
+
+from core.pipeline import CameraPipeline
+
+SOURCE_FPS = 30
+
+
+def make_test_video(path, frames, width, height, fps):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(frames):
+        frame = np.full((height, width, 3), i % 255, dtype=np.uint8)
+        cv2.putText(frame, str(i), (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        return (int(fields[11]) + int(fields[12])) / ticks # utime + stime
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _reader_pids(pipeline):
+    if pipeline.reader_pool is not None:
+        return [p.process.pid for p in pipeline.reader_pool.pool_processes]
+    return [p.pid for p in pipeline.reader_processes.values()]
+
+
+def _consume(q, timestamps, stop):
+    while not stop.is_set():
+        try:
+            q.get(timeout=0.1)
+            timestamps.append(time.perf_counter())
+        except _queue.Empty:
+            pass
+        except (OSError, ValueError):
+            return
+
+
+def run_mode(video_paths, sources_per_process, duration):
+    # Sources must be distinct keys, so each source gets its own copy of the test video
+    pipeline = CameraPipeline(enable_event_store=False, sources_per_reader_process=sources_per_process)
+    stop = threading.Event()
+    consumers = []
+    timestamps = {}
+    for path in video_paths:
+        pipeline.start_reader(path)
+        timestamps[path] = []
+        t = threading.Thread(target=_consume, args=(pipeline.reader_frame_notification_queues[path], timestamps[path], stop), daemon=True)
+        t.start()
+        consumers.append(t)
+
+    time.sleep(1.0) # Let capture settle before measuring
+    pids = _reader_pids(pipeline)
+    cpu_start = sum(_cpu_seconds(pid) for pid in pids)
+    for ts in timestamps.values():
+        ts.clear()
+    start = time.perf_counter()
+    peak_rss = 0
+    while time.perf_counter() - start < duration:
+        peak_rss = max(peak_rss, sum(_rss_bytes(pid) for pid in pids))
+        time.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    cpu_used = sum(_cpu_seconds(pid) for pid in pids) - cpu_start
+    stopped_readers = [path for path in video_paths if not pipeline.reader_processes[path].is_alive()]
+
+    stop.set()
+    for t in consumers:
+        t.join(timeout=1)
+    pipeline.shutdown()
+
+    frames = sum(len(ts) for ts in timestamps.values())
+    intervals = []
+    for ts in timestamps.values():
+        intervals.extend((b - a) * 1000 for a, b in zip(ts, ts[1:]))
+    intervals.sort()
+    return {
+        'processes': len(pids),
+        'fps_per_source': frames / elapsed / len(video_paths),
+        'cpu_ms_per_frame': cpu_used * 1000 / frames if frames else float('nan'),
+        'peak_rss_mb': peak_rss / 1e6,
+        'interval_p50_ms': intervals[len(intervals) // 2] if intervals else float('nan'),
+        'interval_p99_ms': intervals[int(len(intervals) * 0.99)] if intervals else float('nan'),
+        'jitter_ms': statistics.pstdev(intervals) if len(intervals) > 1 else float('nan'),
+        'stopped_readers': len(stopped_readers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=16)
+    parser.add_argument("--sources-per-process", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "source_0.mp4")
+        # Twice the run length at 30 fps, so no paced reader reaches the end of its file
+        make_test_video(template, int(args.duration * 60) + 120, args.width, args.height, SOURCE_FPS)
+        paths = [template]
+        for i in range(1, args.sources):
+            path = os.path.join(tmp, f"source_{i}.mp4")
+            os.link(template, path)
+            paths.append(path)
+
+        results = {}
+        for label, per_process in (("per-process", 0), (f"pooled ({args.sources_per_process}/process)", args.sources_per_process)):
+            print(f"Running {label} readers for {args.sources} sources...")
+            results[label] = run_mode(paths, per_process, args.duration)
+
+    print()
+    print(f"{'mode':<24}{'procs':>7}{'fps/src':>10}{'cpu ms/frame':>14}{'rss MB':>10}{'p50 ms':>9}{'p99 ms':>9}{'jitter ms':>11}")
+    for label, r in results.items():
+        print(f"{label:<24}{r['processes']:>7}{r['fps_per_source']:>10.1f}{r['cpu_ms_per_frame']:>14.2f}{r['peak_rss_mb']:>10.0f}"
+              f"{r['interval_p50_ms']:>9.1f}{r['interval_p99_ms']:>9.1f}{r['jitter_ms']:>11.2f}")
+    print(f"(main process max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB, sources at {SOURCE_FPS} fps)")
+
+    invalid = [label for label, r in results.items() if r['stopped_readers']]
+    if invalid:
+        for label in invalid:
+            print(f"Invalid: {results[label]['stopped_readers']} {label} readers stopped during the measurement window.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
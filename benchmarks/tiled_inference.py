@@ -0,0 +1,61 @@
+"""Measures the cost of tiled inference against a single full-frame pass.
+
+Usage (from the repository root):
+
+    python -m benchmarks.tiled_inference --model yolov8n.pt --width 3840 --height 2160
+
+For each tile size the script reports the number of tiles per frame and the mean and
+p95 latency of ObjectDetector.detect, with and without the extra full-frame pass.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from detection.object_detector import ObjectDetector
+
+
+def measure(detector, frame, runs):
+    detector.detect(frame) # Warm up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detector.detect(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--tile-sizes", type=int, nargs="+", default=[1280, 960, 640])
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+
+    rows = []
+    detector = ObjectDetector(args.model)
+    rows.append(("full frame", 1, *measure(detector, frame, args.runs)))
+    for tile_size in args.tile_sizes:
+        for full_frame_pass in (False, True):
+            detector.tile_size = tile_size
+            detector.tile_overlap = args.overlap
+            detector.full_frame_pass = full_frame_pass
+            tiles = len(detector._tile_windows(frame.shape))
+            label = f"{tile_size}px tiles" + (" + full" if full_frame_pass else "")
+            rows.append((label, tiles, *measure(detector, frame, args.runs)))
+
+    print(f"{args.width}x{args.height} frame, model {args.model}, {args.overlap:.0%} overlap")
+    print(f"{'mode':<22}{'tiles':>7}{'mean ms':>10}{'p95 ms':>10}{'ms/tile':>10}")
+    for label, tiles, mean, p95 in rows:
+        print(f"{label:<22}{tiles:>7}{mean:>10.1f}{p95:>10.1f}{mean / tiles:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
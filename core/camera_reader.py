@@ -1,10 +1,17 @@
+import os
 import cv2
 import time
 import numpy as np
-from multiprocessing import shared_memory
 
-def camera_reader(source, shared_mem_name, shared_mem_size, frame_notification_queue, stop_event):
+from core.recorder import ClipRecorder
+from core.shm_pool import get_process_pool
+from core.resource_scheduler import READER_CV2_THREADS
+
+RECORDER_STATS_INTERVAL = 10.0 # Seconds between recorder stats log lines
+
+def camera_reader(source, shm_prefix, frame_notification_queue, stop_event, record_trigger_queue=None, encode_queue=None, encode_backlog=None, recorder_memory=None):
     print(f"[CameraReader {source}] Starting reader for source: {source}")
+    cv2.setNumThreads(READER_CV2_THREADS) # Decoding needs no thread pool; leave the cores to inference
     # --- Modified: Use DSHOW backend on Windows for better compatibility ---
     import platform
     if platform.system() == "Windows" and isinstance(source, int):
@@ -19,15 +26,23 @@ def camera_reader(source, shared_mem_name, shared_mem_size, frame_notification_q
         return
     print(f"[CameraReader {source}] Camera opened successfully.")
 
-    # Attach to the shared memory block
-    try:
-        shm = shared_memory.SharedMemory(name=shared_mem_name)
-        shared_buffer = shm.buf
-        print(f"[CameraReader {source}] Attached to shared memory: {shared_mem_name}")
-    except Exception as e:
-        print(f"[CameraReader {source}] Error attaching to shared memory: {e}")
-        stop_event.set()
-        return
+    # Video files are played back at their own frame rate, like a live camera; cameras pace themselves
+    pace_interval = 0.0
+    if isinstance(source, str) and os.path.isfile(source):
+        file_fps = cap.get(cv2.CAP_PROP_FPS)
+        if file_fps and file_fps > 0:
+            pace_interval = 1.0 / file_fps
+            print(f"[CameraReader {source}] Playing file at {file_fps:.1f} fps.")
+    next_frame_time = time.time()
+
+    # Shared memory is sized from the negotiated resolution once the first frame arrives
+    shm_pool = get_process_pool()
+    shm = None
+
+    recorder = None
+    if record_trigger_queue is not None and encode_queue is not None:
+        recorder = ClipRecorder(source, record_trigger_queue, encode_queue, encode_backlog, recorder_memory, fps=cap.get(cv2.CAP_PROP_FPS))
+    last_stats_time = time.time()
 
     while not stop_event.is_set():
         ret, frame = cap.read()
@@ -35,29 +50,56 @@ def camera_reader(source, shared_mem_name, shared_mem_size, frame_notification_q
             print(f"[CameraReader {source}] End of stream or error for source {source}")
             break
 
-        # Ensure the frame is C-contiguous for consistent tobytes() behavior
+        # Ensure the frame is C-contiguous for a straight copy into shared memory
         if not frame.flags['C_CONTIGUOUS']:
             frame = np.ascontiguousarray(frame)
 
-        # Ensure frame fits in shared memory
-        frame_bytes = frame.tobytes()
-        if len(frame_bytes) > shared_mem_size:
-            print(f"[CameraReader {source}] Warning: Frame too large ({len(frame_bytes)} bytes) for shared memory ({shared_mem_size} bytes). Skipping frame.")
-            continue
+        # (Re)size the shared memory block when the stream resolution changes
+        if shm is None or frame.nbytes > shm.size or frame.nbytes * 2 < shm.size:
+            try:
+                new_shm = shm_pool.acquire(shm_prefix, frame.nbytes)
+            except Exception as e:
+                print(f"[CameraReader {source}] Error allocating shared memory: {e}")
+                stop_event.set()
+                break
+            if shm is not None:
+                shm_pool.release(shm)
+            shm = new_shm
+            print(f"[CameraReader {source}] Using shared memory {shm.name} ({shm.size} bytes) for {frame.shape[1]}x{frame.shape[0]} frames")
 
         # Write frame to shared memory
-        shared_buffer[:len(frame_bytes)] = frame_bytes
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+
+        if recorder is not None:
+            recorder.add_frame(frame)
+            if recorder.armed and time.time() - last_stats_time >= RECORDER_STATS_INTERVAL:
+                stats = recorder.stats()
+                print(f"[CameraReader {source}] Recorder: {stats['ring_frames']} frames / {stats['ring_bytes'] / 1e6:.1f} MB in ring, "
+                      f"{stats['compress_ms']:.1f} ms per JPEG, {stats['dropped_frames']} frames dropped, encode backlog {stats['encode_backlog']} frames")
+                last_stats_time = time.time()
 
-        # Put frame shape and dtype into queue for workers to reconstruct
-        frame_info = (frame.shape, frame.dtype)
+        # Put frame shape, dtype and block name into queue for workers to reconstruct
+        frame_info = (frame.shape, frame.dtype, shm.name)
         if not frame_notification_queue.full():
             frame_notification_queue.put(frame_info)
             # print(f"[CameraReader {source}] Put frame info to queue. Shape: {frame.shape}, Dtype: {frame.dtype}")
         else:
             print(f"[CameraReader {source}] Frame notification queue full, dropping frame notification.")
 
-        time.sleep(0.001) # Small delay to prevent busy-waiting
+        if pace_interval:
+            next_frame_time += pace_interval
+            delay = next_frame_time - time.time()
+            if delay > 0:
+                stop_event.wait(delay)
+            elif delay < -1.0:
+                next_frame_time = time.time() # Fell far behind; do not try to catch up in a burst
+        else:
+            time.sleep(0.001) # Small delay to prevent busy-waiting
 
+    if recorder is not None:
+        recorder.close()
     cap.release()
-    shm.close() # Close the shared memory connection
+    if shm is not None:
+        shm_pool.release(shm)
+    shm_pool.release_prefix(shm_prefix) # Unlink this source's blocks; attached workers keep their mappings
     print(f"[CameraReader {source}] Exiting.")
\ No newline at end of file
@@ -0,0 +1,249 @@
+import json
+import math
+import multiprocessing
+import os
+import platform
+import time
+import queue as _queue
+
+from core.resource_scheduler import ResourceScheduler, RESERVED_CORES, available_cpus
+
+MODELS = ["yolov8n.pt", "yolov8s.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt"] # Same choices as the main window
+IMAGE_SIZES = [320, 480, 640]
+CACHE_PATH = os.path.join("capacity", "benchmark.json")
+BENCHMARK_RUNS = 5
+BENCHMARK_FRAME_SHAPE = (720, 1280, 3)
+MAX_BENCHMARK_THREADS = 4 # Latency at other thread counts is interpolated from 1 and this many
+RAM_HEADROOM = 0.8 # Fraction of the available RAM the workers may use
+PLANNED_KEYS = ('model_name', 'imgsz', 'inference_fps')
+
+
+def cpu_fingerprint():
+    """Identifies the hardware the benchmark ran on, so a cache copied to another machine is not trusted."""
+    cpu_name = platform.processor()
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu_name = line.split(":", 1)[1].strip()
+                    break
+    return f"{platform.system()}|{platform.machine()}|{cpu_name}|{len(available_cpus())} cpus"
+
+
+def available_ram_mb():
+    """Returns the RAM available for new processes in MB, or None if it cannot be determined."""
+    if os.path.exists("/proc/meminfo"):
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if platform.system() == "Darwin" else rss / 1024 # Bytes on macOS, KB on Linux
+
+
+def _benchmark_model(model_name, image_sizes, thread_counts, runs, result_queue):
+    # Runs in its own process: only here are ultralytics/torch imported, and the peak RSS is that of one worker
+    from core.resource_scheduler import apply_thread_budget
+    apply_thread_budget(max(thread_counts))
+    import numpy as np
+    from detection.object_detector import ObjectDetector
+
+    try:
+        detector = ObjectDetector(model_name=model_name)
+    except Exception as e:
+        result_queue.put((model_name, None, f"could not load model: {e}"))
+        return
+    frame = np.random.default_rng(0).integers(0, 255, BENCHMARK_FRAME_SHAPE, dtype=np.uint8)
+    latency_ms = {}
+    for threads in thread_counts:
+        apply_thread_budget(threads)
+        latency_ms[str(threads)] = {}
+        for imgsz in image_sizes:
+            detector.imgsz = imgsz
+            detector.detect(frame) # Warm up
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                detector.detect(frame)
+                timings.append((time.perf_counter() - start) * 1000)
+            latency_ms[str(threads)][str(imgsz)] = sorted(timings)[len(timings) // 2]
+    result_queue.put((model_name, {'latency_ms': latency_ms, 'rss_mb': _peak_rss_mb()}, None))
+
+
+def load_benchmark(models=MODELS, image_sizes=IMAGE_SIZES, refresh=False, cache_path=CACHE_PATH):
+    """Returns the per-model benchmark for this machine, measuring whatever is not cached yet.
+
+    Each model is measured in a separate process, one after the other, at 1 and up to
+    MAX_BENCHMARK_THREADS intra-op threads. A model whose benchmark fails is recorded as failed
+    and left out until refresh, so a model that cannot be loaded does not delay every start.
+    """
+    fingerprint = cpu_fingerprint()
+    cache = {'fingerprint': fingerprint, 'models': {}, 'failed': {}}
+    if not refresh and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('fingerprint') == fingerprint:
+                cache = cached
+                cache.setdefault('failed', {}) # Caches written before failures were recorded
+            else:
+                print(f"[CapacityPlanner] Benchmark cache {cache_path} is from different hardware; re-measuring.")
+        except (OSError, ValueError) as e:
+            print(f"[CapacityPlanner] Could not read benchmark cache {cache_path}: {e}")
+
+    thread_counts = sorted({1, min(MAX_BENCHMARK_THREADS, len(available_cpus()))})
+    for model_name in models:
+        if model_name in cache['failed']:
+            print(f"[CapacityPlanner] Skipping {model_name}: its benchmark failed before ({cache['failed'][model_name]}). "
+                  f"Run python -m core.capacity_planner <profile> --refresh to retry.")
+    missing = [m for m in models if m not in cache['failed'] and (m not in cache['models']
+               or any(str(s) not in cache['models'][m]['latency_ms']['1'] for s in image_sizes))]
+    for model_name in missing:
+        print(f"[CapacityPlanner] Benchmarking {model_name} at {image_sizes} px with {thread_counts} threads...")
+        result_queue = multiprocessing.Queue()
+        p = multiprocessing.Process(target=_benchmark_model, args=(model_name, image_sizes, thread_counts, BENCHMARK_RUNS, result_queue))
+        p.start()
+        entry, error = None, "benchmark process exited"
+        while p.is_alive() or not result_queue.empty():
+            try:
+                _, entry, error = result_queue.get(timeout=1) # Read before join so a full pipe cannot deadlock
+                break
+            except _queue.Empty:
+                continue
+        p.join()
+        if entry is None:
+            print(f"[CapacityPlanner] Skipping {model_name}: {error}")
+            cache['failed'][model_name] = error
+            continue
+        cache['models'][model_name] = entry
+
+    if missing:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f, indent=4)
+        print(f"[CapacityPlanner] Benchmark saved to {cache_path}")
+    return cache['models']
+
+
+def estimate_latency(entry, imgsz, threads):
+    """Estimates a model's latency at a thread count by power-law interpolation between the measured counts."""
+    measured = {int(t): sizes[str(imgsz)] for t, sizes in entry['latency_ms'].items() if str(imgsz) in sizes}
+    if threads in measured:
+        return measured[threads]
+    low, high = min(measured), max(measured)
+    if threads >= high or low == high:
+        return measured[high] # No speedup assumed past what was measured
+    exponent = math.log(measured[low] / measured[high]) / math.log(high / low)
+    return measured[low] * (threads / low) ** -exponent
+
+
+def format_assignment(camera_id, assignment):
+    imgsz = assignment['imgsz'] or "default"
+    return (f"Camera {camera_id}: {assignment['model_name']} @ {imgsz}px, {assignment['inference_fps']:g} fps, "
+            f"{assignment['threads']} threads, ~{assignment['latency_ms']:.0f} ms per frame")
+
+
+class CapacityPlanner:
+    """Chooses a model, input size and inference rate for each camera that the machine can sustain.
+
+    Every camera gets the most expensive benchmarked (model, imgsz) whose estimated latency on its
+    share of the cores meets max_latency_ms and target_fps, and whose memory fits its share of the
+    RAM. If nothing fits, the camera gets the cheapest option at the rate it can sustain, with a warning.
+    With auto_assign False the plan is only reported, and the cameras keep their configured models.
+    """
+
+    def __init__(self, target_fps, max_latency_ms, auto_assign=False, benchmark=None, cpus=None,
+                 ram_mb=None, reserved_cores=RESERVED_CORES):
+        self.target_fps = target_fps
+        self.max_latency_ms = max_latency_ms
+        self.auto_assign = auto_assign
+        self.benchmark = benchmark if benchmark is not None else load_benchmark()
+        self.scheduler = ResourceScheduler(cpus, reserved_cores) # Same split the pipeline will use
+        self.ram_mb = ram_mb if ram_mb is not None else available_ram_mb()
+
+    def plan(self, camera_configs):
+        """Returns ({camera_id: assignment}, [warnings]) for {camera_id: config}.
+
+        Tiled cameras are left out of the plan: their cost depends on the tile count. They still
+        take their share of the cores.
+        """
+        warnings = []
+        if not self.benchmark:
+            return {}, ["No benchmark results; cannot plan."]
+        core_plan = self.scheduler.plan(sorted(camera_configs))
+        worker_cores = len({cpu for a in core_plan.values() for cpu in a['cpus']})
+        share = min(1.0, worker_cores / len(core_plan)) if core_plan else 1.0 # Fraction of a core when workers share cores
+        ram_per_camera = self.ram_mb * RAM_HEADROOM / len(core_plan) if self.ram_mb and core_plan else None
+
+        assignments = {}
+        for camera_id, config in sorted(camera_configs.items()):
+            if config.get('enable_tiling'):
+                warnings.append(f"Camera {camera_id} uses tiled inference and is not planned; its cost grows with the tile count.")
+                continue
+            threads = core_plan[camera_id]['threads']
+            options = []
+            for model_name, entry in self.benchmark.items():
+                for imgsz in sorted(int(s) for s in entry['latency_ms']['1']):
+                    latency = estimate_latency(entry, imgsz, threads) / share
+                    fits_ram = ram_per_camera is None or entry['rss_mb'] is None or entry['rss_mb'] <= ram_per_camera
+                    options.append((latency, model_name, imgsz, fits_ram))
+            options.sort(reverse=True) # Most compute first
+
+            chosen = None
+            for latency, model_name, imgsz, fits_ram in options:
+                if fits_ram and latency <= self.max_latency_ms and 1000 / latency >= self.target_fps:
+                    chosen = (latency, model_name, imgsz)
+                    break
+            if chosen is None:
+                fitting = [o for o in options if o[3]] or options
+                latency, model_name, imgsz, _ = fitting[-1] # Cheapest
+                chosen = (latency, model_name, imgsz)
+                if not any(o[3] for o in options):
+                    warnings.append(f"Camera {camera_id}: no model fits in {ram_per_camera:.0f} MB of RAM per camera.")
+                warnings.append(f"Camera {camera_id}: cannot reach {self.target_fps:g} fps within {self.max_latency_ms:g} ms; "
+                                f"best is {model_name} @ {imgsz}px at {1000 / latency:.1f} fps, ~{latency:.0f} ms.")
+
+            latency, model_name, imgsz = chosen
+            assignments[camera_id] = {
+                'model_name': model_name,
+                'imgsz': imgsz,
+                'inference_fps': round(min(self.target_fps, 1000 / latency), 1),
+                'threads': threads,
+                'latency_ms': latency
+            }
+        return assignments, warnings
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from utils.profile_manager import load_profile
+
+    parser = argparse.ArgumentParser(description="Recommend a model, input size and inference rate per camera of a profile for this machine.")
+    parser.add_argument("profile", help="Profile name, as saved from the main window")
+    parser.add_argument("--fps", type=float, required=True, help="Target inference rate per camera")
+    parser.add_argument("--latency", type=float, required=True, help="Maximum latency per frame in ms")
+    parser.add_argument("--refresh", action="store_true", help="Re-run the benchmark even if it is cached")
+    args = parser.parse_args()
+
+    configs = load_profile(args.profile)
+    if configs is None:
+        sys.exit(1)
+    planner = CapacityPlanner(args.fps, args.latency, benchmark=load_benchmark(refresh=args.refresh))
+    assignments, warnings = planner.plan(dict(enumerate(configs)))
+    for camera_id, assignment in assignments.items():
+        print(format_assignment(camera_id, assignment))
+    for warning in warnings:
+        print(f"Warning: {warning}")
+    sys.exit(1 if warnings else 0)
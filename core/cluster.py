@@ -0,0 +1,476 @@
+import hmac
+import json
+import os
+import queue as _queue
+import secrets
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from core.pipeline import CameraPipeline, camera_config_from_profile
+
+COORDINATOR_HOST = "127.0.0.1"
+COORDINATOR_PORT = 9000
+HEARTBEAT_INTERVAL = 2.0 # Seconds between agent heartbeats
+AGENT_TIMEOUT = 10.0 # An agent silent for this long is considered gone
+RECONNECT_DELAY = 2.0
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_INTERVAL = 0.5 # Minimum seconds between thumbnails per camera
+FAILED_CAMERA_RETRY = 30.0 # Seconds before a camera is offered again to an agent it failed on
+MAX_HEADER_BYTES = 1 << 20 # Larger lengths from a peer are treated as a protocol error
+MAX_PAYLOAD_BYTES = 16 << 20
+TOKEN_ENV = "CAMERA_CLUSTER_TOKEN"
+
+# Each message is a JSON header plus an optional binary payload (a JPEG thumbnail),
+# framed as: header length, payload length, header bytes, payload bytes.
+_FRAME_HEADER = struct.Struct('!II')
+
+
+def send_message(sock, header, payload=b''):
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(_FRAME_HEADER.pack(len(data), len(payload)) + data + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """Returns (header, payload), or None if the connection was closed. Raises ValueError on a malformed message."""
+    lengths = _recv_exact(sock, _FRAME_HEADER.size)
+    if lengths is None:
+        return None
+    header_len, payload_len = _FRAME_HEADER.unpack(lengths)
+    # Lengths come from the peer; refuse to allocate for absurd ones
+    if header_len > MAX_HEADER_BYTES or payload_len > MAX_PAYLOAD_BYTES:
+        raise ValueError(f"message too large (header {header_len} bytes, payload {payload_len} bytes)")
+    data = _recv_exact(sock, header_len)
+    payload = _recv_exact(sock, payload_len) if payload_len else b''
+    if data is None or payload is None:
+        return None
+    header = json.loads(data.decode('utf-8'))
+    if not isinstance(header, dict):
+        raise ValueError("message header is not an object")
+    return header, payload
+
+
+def parse_address(address, default_port):
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, default_port
+    return host, int(port)
+
+
+class _AgentConnection:
+    def __init__(self, agent_id, sock, capacity):
+        self.agent_id = agent_id
+        self.sock = sock
+        self.capacity = capacity
+        self.cameras = set()
+        self.send_lock = threading.Lock()
+
+    def send(self, header):
+        with self.send_lock:
+            send_message(self.sock, header)
+
+    @property
+    def load(self):
+        return len(self.cameras) / self.capacity if self.capacity else float('inf')
+
+
+class Coordinator:
+    """Assigns cameras to detection agents over TCP and collects their results.
+
+    Cameras are given to the least loaded agent with spare capacity. When an agent disconnects
+    or stops sending heartbeats, its cameras go back to the pending set and are reassigned to the
+    remaining agents. A camera an agent reports as failed is moved to another agent, and is only
+    offered to the failing agent again after FAILED_CAMERA_RETRY seconds. Results are passed to a sink object with on_detections(camera_id, records,
+    thumbnail) and on_assignments(assignments) methods.
+    """
+
+    def __init__(self, camera_configs, sink, host=COORDINATOR_HOST, port=COORDINATOR_PORT, token=None):
+        self.camera_configs = dict(camera_configs) # camera_id -> config
+        self.generated_token = not token
+        self.token = token or secrets.token_urlsafe(16)
+        self.sink = sink
+        self.host = host
+        self.port = port
+        self.agents = {}
+        self.assignments = {} # camera_id -> agent_id
+        self.failures = {} # camera_id -> {agent_id: time of the failure report}
+        self.lock = threading.RLock()
+        self.running = False
+        self.server_sock = None
+
+    def start(self):
+        self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_sock.bind((self.host, self.port))
+        self.server_sock.listen()
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._retry_loop, daemon=True).start()
+        print(f"[Coordinator] Listening for agents on {self.host}:{self.port} with {len(self.camera_configs)} cameras to assign.")
+        if self.generated_token:
+            print(f"[Coordinator] No token given; agents must connect with --token {self.token} (or set {TOKEN_ENV}).")
+
+    def stop(self):
+        self.running = False
+        if self.server_sock is not None:
+            self.server_sock.close()
+        with self.lock:
+            for agent in list(self.agents.values()):
+                agent.sock.close()
+        print("[Coordinator] Stopped.")
+
+    def add_camera(self, camera_id, config):
+        with self.lock:
+            self.camera_configs[camera_id] = config
+            self._assign_pending()
+
+    def remove_camera(self, camera_id):
+        with self.lock:
+            self.camera_configs.pop(camera_id, None)
+            agent_id = self.assignments.pop(camera_id, None)
+            agent = self.agents.get(agent_id)
+            if agent is not None:
+                agent.cameras.discard(camera_id)
+                self._send(agent, {'type': 'unassign', 'camera_id': camera_id})
+            self._notify_assignments()
+
+    def _retry_loop(self):
+        # Lets failed cameras be tried again on agents they failed on, e.g. once the source is back
+        while self.running:
+            time.sleep(FAILED_CAMERA_RETRY / 6)
+            with self.lock:
+                now = time.time()
+                expired = False
+                for camera_id, agents in list(self.failures.items()):
+                    for agent_id, failed_at in list(agents.items()):
+                        if now - failed_at >= FAILED_CAMERA_RETRY:
+                            del agents[agent_id]
+                            expired = True
+                    if not agents:
+                        del self.failures[camera_id]
+                if expired:
+                    self._assign_pending()
+
+    def _camera_failed(self, agent, camera_id, reason):
+        with self.lock:
+            if self.assignments.get(camera_id) != agent.agent_id:
+                return # Already unassigned or moved
+            del self.assignments[camera_id]
+            agent.cameras.discard(camera_id)
+            self.failures.setdefault(camera_id, {})[agent.agent_id] = time.time()
+            print(f"[Coordinator] Agent {agent.agent_id} could not run camera {camera_id} ({reason}); reassigning it.")
+            self._assign_pending()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, address = self.server_sock.accept()
+            except OSError:
+                break # Server socket closed
+            threading.Thread(target=self._serve_agent, args=(sock, address), daemon=True).start()
+
+    def _serve_agent(self, sock, address):
+        sock.settimeout(AGENT_TIMEOUT)
+        agent = None
+        try:
+            message = recv_message(sock)
+            if message is None or message[0].get('type') != 'hello':
+                print(f"[Coordinator] Rejected connection from {address}: expected hello.")
+                return
+            hello = message[0]
+            if not hmac.compare_digest(str(hello.get('token', '')).encode('utf-8'), self.token.encode('utf-8')):
+                print(f"[Coordinator] Rejected connection from {address}: wrong or missing token.")
+                self._reject(sock, "wrong or missing token")
+                return
+            try:
+                agent_id, capacity = str(hello['agent_id']), max(1, int(hello['capacity']))
+            except (KeyError, TypeError, ValueError):
+                print(f"[Coordinator] Rejected connection from {address}: malformed hello.")
+                self._reject(sock, "malformed hello")
+                return
+            agent = _AgentConnection(agent_id, sock, capacity)
+            with self.lock:
+                if agent.agent_id in self.agents:
+                    print(f"[Coordinator] Agent id {agent.agent_id} already connected; rejecting {address}.")
+                    # Usually a reconnect racing the old connection's timeout, so the agent may try again
+                    self._reject(sock, f"agent id {agent.agent_id} already connected", retry=True)
+                    agent = None
+                    return
+                self.agents[agent.agent_id] = agent
+                print(f"[Coordinator] Agent {agent.agent_id} joined from {address[0]} with capacity {agent.capacity}.")
+                self._assign_pending()
+
+            while self.running:
+                message = recv_message(sock)
+                if message is None:
+                    break
+                header, payload = message
+                if header.get('type') == 'detections':
+                    records = [(r[0], r[1], r[2], r[3], tuple(r[4])) for r in header['records']]
+                    self.sink.on_detections(header['camera_id'], records, payload or None)
+                elif header.get('type') == 'camera_failed':
+                    self._camera_failed(agent, header['camera_id'], header.get('reason', 'unknown reason'))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Malformed messages end the connection like a network error; the agent's cameras are reassigned
+            if agent is not None:
+                print(f"[Coordinator] Lost agent {agent.agent_id}: {e!r}")
+            else:
+                print(f"[Coordinator] Dropped connection from {address}: {e!r}")
+        finally:
+            sock.close()
+            if agent is not None:
+                self._remove_agent(agent)
+
+    @staticmethod
+    def _reject(sock, reason, retry=False):
+        try:
+            send_message(sock, {'type': 'rejected', 'reason': reason, 'retry': retry})
+        except OSError:
+            pass
+
+    def _remove_agent(self, agent):
+        with self.lock:
+            if self.agents.get(agent.agent_id) is not agent:
+                return
+            del self.agents[agent.agent_id]
+            for camera_id in agent.cameras:
+                self.assignments.pop(camera_id, None)
+            print(f"[Coordinator] Agent {agent.agent_id} left; reassigning cameras {sorted(agent.cameras)}.")
+            self._assign_pending()
+
+    def _send(self, agent, header):
+        try:
+            agent.send(header)
+            return True
+        except OSError as e:
+            print(f"[Coordinator] Could not send to agent {agent.agent_id}: {e}")
+            return False
+
+    def _assign_pending(self):
+        # Called with self.lock held
+        for camera_id in sorted(self.camera_configs):
+            if camera_id in self.assignments:
+                continue
+            failed_on = self.failures.get(camera_id, {})
+            candidates = [agent for agent in self.agents.values()
+                          if len(agent.cameras) < agent.capacity and agent.agent_id not in failed_on]
+            if not candidates:
+                if failed_on:
+                    print(f"[Coordinator] Camera {camera_id} failed on agents {sorted(failed_on)}; retrying within {FAILED_CAMERA_RETRY:.0f}s.")
+                else:
+                    print(f"[Coordinator] No agent capacity for camera {camera_id}; it will be assigned when an agent joins.")
+                continue
+            agent = min(candidates, key=lambda a: (a.load, a.agent_id))
+            if self._send(agent, {'type': 'assign', 'camera_id': camera_id, 'config': self.camera_configs[camera_id]}):
+                agent.cameras.add(camera_id)
+                self.assignments[camera_id] = agent.agent_id
+                print(f"[Coordinator] Assigned camera {camera_id} to agent {agent.agent_id}.")
+        self._notify_assignments()
+
+    def _notify_assignments(self):
+        self.sink.on_assignments(dict(self.assignments))
+
+    def status(self):
+        with self.lock:
+            return {
+                'agents': {agent_id: {'capacity': agent.capacity, 'cameras': sorted(agent.cameras)}
+                           for agent_id, agent in self.agents.items()},
+                'unassigned': sorted(set(self.camera_configs) - set(self.assignments)),
+                'failed': {camera_id: sorted(agents) for camera_id, agents in self.failures.items()},
+            }
+
+
+class HeadlessSink:
+    """Coordinator sink for running without the GUI: stores events, serves streams and logs a summary."""
+
+    def __init__(self, event_queue=None, stream_server=None, summary_interval=10.0):
+        self.event_queue = event_queue
+        self.stream_server = stream_server
+        self.summary_interval = summary_interval
+        self.counts = {}
+        self.last_summary = time.time()
+        self.lock = threading.Lock()
+
+    def on_detections(self, camera_id, records, thumbnail):
+        if self.event_queue is not None and records:
+            try:
+                self.event_queue.put_nowait(records)
+            except _queue.Full:
+                pass
+        if self.stream_server is not None:
+            detections = [{'timestamp': timestamp, 'class': class_name, 'confidence': conf, 'box': list(box)}
+                          for timestamp, _, class_name, conf, box in records]
+            frame = None
+            if thumbnail is not None:
+                frame = cv2.imdecode(np.frombuffer(thumbnail, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                self.stream_server.publish(camera_id, frame, detections)
+
+        with self.lock:
+            per_camera = self.counts.setdefault(camera_id, {})
+            for _, _, class_name, _, _ in records:
+                per_camera[class_name] = per_camera.get(class_name, 0) + 1
+            if time.time() - self.last_summary >= self.summary_interval:
+                for cam_id in sorted(self.counts):
+                    print(f"[Coordinator] Camera {cam_id}: {self.counts[cam_id]}")
+                self.counts = {}
+                self.last_summary = time.time()
+
+    def on_assignments(self, assignments):
+        print(f"[Coordinator] Assignments: {assignments}")
+
+
+def run_coordinator(profile_configs, host=COORDINATOR_HOST, port=COORDINATOR_PORT, sink=None, token=None):
+    if sink is None:
+        sink = HeadlessSink()
+    camera_configs = {camera_id: camera_config_from_profile(config) for camera_id, config in enumerate(profile_configs)}
+    coordinator = Coordinator(camera_configs, sink, host, port, token)
+    coordinator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.stop()
+
+
+def _make_thumbnail(frame, width=THUMBNAIL_WIDTH):
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return jpeg.tobytes() if ok else b''
+
+
+def _agent_receive_loop(sock, commands):
+    try:
+        while True:
+            message = recv_message(sock)
+            if message is None:
+                break
+            commands.put(message[0])
+    except (OSError, ValueError) as e:
+        print(f"[Agent] Connection to coordinator failed: {e!r}")
+    commands.put({'type': 'disconnected'})
+
+
+def run_agent(host=COORDINATOR_HOST, port=COORDINATOR_PORT, capacity=None, agent_id=None, send_thumbnails=False, sources_per_reader_process=0, planner=None, token=None):
+    if capacity is None:
+        capacity = max(1, (os.cpu_count() or 2) // 2)
+    if agent_id is None:
+        agent_id = f"{socket.gethostname()}-{os.getpid()}"
+    # Events are stored by the coordinator's sink, not on each agent
+    # Each agent plans against its own hardware
+    pipeline = CameraPipeline(enable_event_store=False, sources_per_reader_process=sources_per_reader_process, planner=planner)
+    print(f"[Agent {agent_id}] Starting with capacity {capacity}, coordinator {host}:{port}")
+
+    try:
+        while True:
+            try:
+                sock = socket.create_connection((host, port), timeout=AGENT_TIMEOUT)
+            except OSError as e:
+                print(f"[Agent {agent_id}] Could not connect to coordinator: {e}. Retrying in {RECONNECT_DELAY}s.")
+                time.sleep(RECONNECT_DELAY)
+                continue
+            sock.settimeout(None)
+            print(f"[Agent {agent_id}] Connected to coordinator.")
+            rejected = _run_agent_session(sock, pipeline, agent_id, capacity, send_thumbnails, token)
+            sock.close()
+            # Cameras belong to the coordinator; drop them and wait to be reassigned
+            for camera_id in list(pipeline.camera_configs):
+                pipeline.stop_camera(camera_id)
+            if rejected:
+                break # Retrying with the same token or hello would be rejected again
+            print(f"[Agent {agent_id}] Disconnected from coordinator. Reconnecting in {RECONNECT_DELAY}s.")
+            time.sleep(RECONNECT_DELAY)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.shutdown()
+        print(f"[Agent {agent_id}] Exiting.")
+
+
+def _start_assigned_camera(pipeline, camera_id, config):
+    """Starts a camera the coordinator assigned. Returns None, or the reason it could not be started."""
+    try:
+        if pipeline.start_camera(camera_id, config):
+            return None
+        reason = "could not start reader"
+    except Exception as e:
+        # A config the pipeline cannot run (e.g. missing keys) is this camera's failure, not the agent's
+        reason = f"error starting camera: {e!r}"
+    pipeline.stop_camera(camera_id)
+    return reason
+
+
+def _run_agent_session(sock, pipeline, agent_id, capacity, send_thumbnails, token):
+    """Serves one coordinator connection. Returns True if the coordinator rejected this agent for good."""
+    commands = _queue.Queue()
+    try:
+        send_message(sock, {'type': 'hello', 'agent_id': agent_id, 'capacity': capacity, 'token': token or ''})
+    except OSError:
+        return False
+    threading.Thread(target=_agent_receive_loop, args=(sock, commands), daemon=True).start()
+
+    last_heartbeat = 0.0
+    last_thumbnail = {}
+    while True:
+        # Pipeline changes happen on this thread only
+        try:
+            while True:
+                command = commands.get_nowait()
+                if command['type'] == 'disconnected':
+                    return False
+                if command['type'] == 'rejected':
+                    print(f"[Agent {agent_id}] Rejected by coordinator: {command.get('reason')}.")
+                    return not command.get('retry', False)
+                if command['type'] == 'assign':
+                    print(f"[Agent {agent_id}] Assigned camera {command['camera_id']}.")
+                    reason = _start_assigned_camera(pipeline, command['camera_id'], command['config'])
+                    if reason is not None:
+                        print(f"[Agent {agent_id}] Could not start camera {command['camera_id']}: {reason}.")
+                        send_message(sock, {'type': 'camera_failed', 'camera_id': command['camera_id'], 'reason': reason})
+                elif command['type'] == 'unassign':
+                    print(f"[Agent {agent_id}] Unassigned camera {command['camera_id']}.")
+                    pipeline.stop_camera(command['camera_id'])
+        except _queue.Empty:
+            pass
+        except OSError:
+            return False
+
+        try:
+            for camera_id, frame, records in pipeline.poll_outputs():
+                thumbnail = b''
+                now = time.time()
+                if send_thumbnails and now - last_thumbnail.get(camera_id, 0.0) >= THUMBNAIL_INTERVAL:
+                    thumbnail = _make_thumbnail(frame)
+                    last_thumbnail[camera_id] = now
+                if records or thumbnail:
+                    send_message(sock, {'type': 'detections', 'camera_id': camera_id, 'records': records}, thumbnail)
+            if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                # Hand back cameras whose source went away or whose worker crashed, so they can move elsewhere
+                for camera_id, reason in pipeline.failed_cameras().items():
+                    print(f"[Agent {agent_id}] Camera {camera_id} failed: {reason}.")
+                    pipeline.stop_camera(camera_id)
+                    send_message(sock, {'type': 'camera_failed', 'camera_id': camera_id, 'reason': reason})
+                send_message(sock, {'type': 'heartbeat'})
+                last_heartbeat = time.time()
+        except OSError:
+            return False
+        time.sleep(0.01)
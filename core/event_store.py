@@ -0,0 +1,269 @@
+import json
+import os
+import time
+import queue as _queue
+
+import numpy as np
+
+EVENTS_DIR = "events"
+SEGMENT_SECONDS = 15 * 60 # Rotate to a new segment every 15 minutes
+FLUSH_INTERVAL = 1.0 # Seconds between batched writes
+FLUSH_BATCH_SIZE = 512 # Records buffered before an early flush
+
+# One fixed-size row per detection. Segments are raw arrays of this dtype,
+# so a reader can np.fromfile() a whole segment and filter it vectorized.
+EVENT_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('camera_id', '<u2'),
+    ('class_id', '<u2'),
+    ('confidence', '<f4'),
+    ('x1', '<f4'),
+    ('y1', '<f4'),
+    ('x2', '<f4'),
+    ('y2', '<f4'),
+])
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx.json"
+
+
+def make_event_records(camera_id, results, target_classes=None, class_names=None, timestamp=None):
+    """Converts detector results into a list of (timestamp, camera_id, class_name, conf, box) tuples."""
+    if timestamp is None:
+        timestamp = time.time()
+    records = []
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        classes = boxes.cls.cpu().numpy().astype(int)
+        confs = boxes.conf.cpu().numpy()
+        coords = boxes.xyxy.cpu().numpy()
+        for cls, conf, xyxy in zip(classes, confs, coords):
+            name = class_names[cls] if class_names else str(cls)
+            if target_classes and name not in target_classes:
+                continue
+            records.append((timestamp, camera_id, name, float(conf), tuple(float(v) for v in xyxy)))
+    return records
+
+
+def segment_window(filename, segment_seconds=SEGMENT_SECONDS):
+    """Returns the start of the time window a segment or index file covers, from its name, or None."""
+    try:
+        first_record_time = int(os.path.basename(filename).split('.', 1)[0]) / 1000
+    except ValueError:
+        return None
+    return first_record_time - first_record_time % segment_seconds
+
+
+class _Segment:
+    def __init__(self, store_dir, start_time, first_record_time):
+        self.start_time = start_time
+        # Named after the first record rather than the window, so a restarted writer never reopens a segment
+        name_ms = int(first_record_time * 1000)
+        while True:
+            self.base_path = os.path.join(store_dir, f"{name_ms:016d}")
+            self.data_path = self.base_path + SEGMENT_SUFFIX
+            self.index_path = self.base_path + INDEX_SUFFIX
+            try:
+                self.file = open(self.data_path, 'xb')
+                break
+            except FileExistsError:
+                name_ms += 1 # A late record reopened a window whose first segment started in the same ms
+        self.class_ids = {} # class name -> class_id used in this segment
+        self.counts = {} # camera_id (str) -> {class name: count}
+        self.min_time = None
+        self.max_time = None
+        self.record_count = 0
+
+    def append(self, records):
+        rows = np.empty(len(records), dtype=EVENT_DTYPE)
+        for i, (timestamp, camera_id, class_name, conf, box) in enumerate(records):
+            class_id = self.class_ids.setdefault(class_name, len(self.class_ids))
+            rows[i] = (timestamp, camera_id, class_id, conf, *box)
+            per_camera = self.counts.setdefault(str(camera_id), {})
+            per_camera[class_name] = per_camera.get(class_name, 0) + 1
+        rows.tofile(self.file)
+        self.file.flush()
+
+        batch_min = float(rows['timestamp'].min())
+        batch_max = float(rows['timestamp'].max())
+        self.min_time = batch_min if self.min_time is None else min(self.min_time, batch_min)
+        self.max_time = batch_max if self.max_time is None else max(self.max_time, batch_max)
+        self.record_count += len(rows)
+        self.write_index()
+
+    def write_index(self, closed=False):
+        index = {
+            'segment': os.path.basename(self.data_path),
+            'start_time': self.start_time,
+            'min_time': self.min_time,
+            'max_time': self.max_time,
+            'record_count': self.record_count,
+            'class_ids': self.class_ids,
+            'counts': self.counts,
+            'closed': closed,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path) # Readers never see a half-written index
+
+    def close(self):
+        self.file.close()
+        if self.record_count == 0:
+            os.remove(self.data_path)
+        else:
+            self.write_index(closed=True)
+
+
+def event_writer(event_queue, stop_event, store_dir=EVENTS_DIR, segment_seconds=SEGMENT_SECONDS):
+    print(f"[EventWriter] Starting, writing segments to: {store_dir}")
+    os.makedirs(store_dir, exist_ok=True)
+
+    segment = None
+    pending = []
+    last_flush = time.time()
+
+    def flush():
+        nonlocal segment
+        if not pending:
+            return
+        pending.sort(key=lambda record: record[0])
+        start = 0
+        while start < len(pending):
+            # Split the batch at segment boundaries so each segment only holds records from its time window.
+            # Late records from an earlier window get a segment of their own, so readers can skip
+            # segments by the window in their file name.
+            timestamp = pending[start][0]
+            if segment is None or not segment.start_time <= timestamp < segment.start_time + segment_seconds:
+                if segment is not None:
+                    segment.close()
+                segment = _Segment(store_dir, timestamp - timestamp % segment_seconds, timestamp)
+            end = start
+            window_end = segment.start_time + segment_seconds
+            while end < len(pending) and pending[end][0] < window_end:
+                end += 1
+            segment.append(pending[start:end])
+            start = end
+        pending.clear()
+
+    while not stop_event.is_set():
+        try:
+            batch = event_queue.get(timeout=FLUSH_INTERVAL)
+            pending.extend(batch)
+        except _queue.Empty:
+            pass
+        except Exception as e:
+            print(f"[EventWriter] Error reading from event queue: {e}")
+
+        now = time.time()
+        if len(pending) >= FLUSH_BATCH_SIZE or now - last_flush >= FLUSH_INTERVAL:
+            try:
+                flush()
+            except Exception as e:
+                print(f"[EventWriter] Error writing events: {e}")
+                pending.clear()
+            last_flush = now
+
+    # Drain anything still queued before exiting
+    while True:
+        try:
+            pending.extend(event_queue.get_nowait())
+        except Exception:
+            break
+    try:
+        flush()
+    except Exception as e:
+        print(f"[EventWriter] Error writing events: {e}")
+    if segment is not None:
+        segment.close()
+    print("[EventWriter] Exiting.")
+
+
+class EventStore:
+    def __init__(self, store_dir=EVENTS_DIR, segment_seconds=SEGMENT_SECONDS):
+        self.store_dir = store_dir
+        self.segment_seconds = segment_seconds # Must match the writer's, to tell a segment's window from its name
+
+    def _load_indexes(self, start=None, end=None):
+        if not os.path.isdir(self.store_dir):
+            return []
+        indexes = []
+        for filename in sorted(os.listdir(self.store_dir)):
+            if not filename.endswith(INDEX_SUFFIX):
+                continue
+            # Skip segments outside [start, end) by name, without opening their index
+            window_start = segment_window(filename, self.segment_seconds)
+            if window_start is not None:
+                if start is not None and window_start + self.segment_seconds <= start:
+                    continue
+                if end is not None and window_start >= end:
+                    continue
+            try:
+                with open(os.path.join(self.store_dir, filename), 'r') as f:
+                    indexes.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[EventStore] Skipping unreadable index {filename}: {e}")
+        return indexes
+
+    @staticmethod
+    def _index_matches(index, camera_id, class_name, start, end):
+        if index['record_count'] == 0 or index['min_time'] is None:
+            return False
+        if start is not None and index['max_time'] < start:
+            return False
+        if end is not None and index['min_time'] >= end:
+            return False
+        if camera_id is not None and str(camera_id) not in index['counts']:
+            return False
+        if class_name is not None:
+            cameras = [str(camera_id)] if camera_id is not None else index['counts'].keys()
+            if not any(class_name in index['counts'][cam] for cam in cameras):
+                return False
+        return True
+
+    def _read_segment(self, index, camera_id, class_name, start, end):
+        path = os.path.join(self.store_dir, index['segment'])
+        rows = np.fromfile(path, dtype=EVENT_DTYPE)
+        rows = rows[:index['record_count']] # Ignore any partial write past the last indexed batch
+        mask = np.ones(len(rows), dtype=bool)
+        if camera_id is not None:
+            mask &= rows['camera_id'] == camera_id
+        if class_name is not None:
+            mask &= rows['class_id'] == index['class_ids'][class_name]
+        if start is not None:
+            mask &= rows['timestamp'] >= start
+        if end is not None:
+            mask &= rows['timestamp'] < end
+        return rows[mask]
+
+    def query(self, camera_id=None, class_name=None, start=None, end=None):
+        """Yields (timestamp, camera_id, class_name, confidence, (x1, y1, x2, y2)) for matching events."""
+        for index in self._load_indexes(start, end):
+            if not self._index_matches(index, camera_id, class_name, start, end):
+                continue
+            class_names = {class_id: name for name, class_id in index['class_ids'].items()}
+            for row in self._read_segment(index, camera_id, class_name, start, end):
+                yield (float(row['timestamp']), int(row['camera_id']), class_names[int(row['class_id'])],
+                       float(row['confidence']), (float(row['x1']), float(row['y1']), float(row['x2']), float(row['y2'])))
+
+    def count(self, camera_id=None, class_name=None, start=None, end=None):
+        total = 0
+        for index in self._load_indexes(start, end):
+            if not self._index_matches(index, camera_id, class_name, start, end):
+                continue
+            fully_covered = ((start is None or index['min_time'] >= start) and
+                             (end is None or index['max_time'] < end))
+            if fully_covered:
+                # Answer from the index alone without touching the segment data
+                cameras = [str(camera_id)] if camera_id is not None else index['counts'].keys()
+                for cam in cameras:
+                    per_camera = index['counts'].get(cam, {})
+                    if class_name is None:
+                        total += sum(per_camera.values())
+                    else:
+                        total += per_camera.get(class_name, 0)
+            else:
+                total += len(self._read_segment(index, camera_id, class_name, start, end))
+        return total
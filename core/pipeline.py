@@ -0,0 +1,396 @@
+import os
+import multiprocessing
+import queue as _queue
+
+from core.workers import camera_worker
+from core.camera_reader import camera_reader
+from core.event_store import event_writer
+from core.recorder import clip_encoder, DEFAULT_PRE_ROLL_SECONDS, DEFAULT_POST_ROLL_SECONDS
+from core.reader_pool import ReaderPool
+from detection.tiling import DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP
+from core.shm_pool import source_prefix, reclaim_stale_segments, reclaim_prefix
+from core.resource_scheduler import ResourceScheduler, set_process_affinity, format_cpus
+from core.capacity_planner import format_assignment, PLANNED_KEYS
+
+
+def camera_config_from_profile(config):
+    """Builds a full camera config from a saved profile entry, filling in defaults for missing keys."""
+    return {
+        'source': config['source'],
+        'model_name': config['model_name'],
+        'target_classes': config['target_classes'],
+        'enable_face_detection': False, # New: Default to False
+        'enable_recording': config.get('enable_recording', False),
+        'record_min_confidence': config.get('record_min_confidence', 0.5),
+        'pre_roll_seconds': config.get('pre_roll_seconds', DEFAULT_PRE_ROLL_SECONDS),
+        'post_roll_seconds': config.get('post_roll_seconds', DEFAULT_POST_ROLL_SECONDS),
+        'enable_tiling': config.get('enable_tiling', False),
+        'tile_size': config.get('tile_size', DEFAULT_TILE_SIZE),
+        'tile_overlap': config.get('tile_overlap', DEFAULT_TILE_OVERLAP),
+        'tile_full_frame': config.get('tile_full_frame', True),
+        'tile_regions': config.get('tile_regions', []),
+        'imgsz': config.get('imgsz'), # None: the model's default input size
+        'inference_fps': config.get('inference_fps', 0) # 0: run inference on every frame
+    }
+
+
+class CameraPipeline:
+    """Starts and stops the reader, worker, encoder and event writer processes for a set of cameras.
+
+    Used by the main window and by cluster agents, so both run the same process graph.
+    """
+    def __init__(self, enable_event_store=True, sources_per_reader_process=0, planner=None):
+        self.camera_configs = {} # Configs of the running cameras
+        self.camera_processes = {} # Worker processes
+        self.camera_queues = {} # Queues for workers to send frames to main process
+        self.camera_stop_events = {} # Stop events for workers
+
+        # CPU cores are split between the workers and re-split whenever one starts or stops
+        self.scheduler = ResourceScheduler()
+        self.thread_budgets = {} # Intra-op thread count per worker, read by the worker every frame
+        self.resource_assignments = {} # camera_id -> {'threads': n, 'cpus': [...]}
+        self.inference_rates = {} # Inference fps per worker (0 = every frame), changed without a restart
+
+        # Optional CapacityPlanner: re-plans models, input sizes and rates whenever a camera is started
+        self.planner = planner
+        self.capacity_plan = {}
+
+        self.reader_processes = {} # Reader processes
+        self.reader_frame_notification_queues = {} # Queues for readers to send frame info to workers
+        self.reader_stop_events = {} # Stop events for readers
+        # Readers size their own shared memory; blocks are named after this process and the source id
+        self.shm_prefixes = {}
+        self.next_source_id = 0
+        reclaim_stale_segments() # Blocks left behind by a crashed run
+        # With sources_per_reader_process > 0, readers run as threads in shared reader processes
+        self.reader_pool = ReaderPool(sources_per_reader_process) if sources_per_reader_process > 0 else None
+
+        # Clip recording, per source: triggers from workers to the reader's recorder, and a lazily started encoder
+        self.record_trigger_queues = {}
+        self.encode_queues = {}
+        self.encode_backlogs = {} # Frames handed to the encoder but not yet written
+        self.recorder_memories = {} # Bytes held in the reader's pre-roll ring
+        self.encoder_processes = {}
+        self.encoder_stop_events = {}
+        self.armed_sources = {} # camera_id -> source whose recorder the camera's worker has armed
+
+        # Detection event store: workers stream records to a single writer process
+        self.event_queue = None
+        self.event_writer_process = None
+        if enable_event_store:
+            self.event_queue = multiprocessing.Queue(maxsize=1000)
+            self.event_writer_stop_event = multiprocessing.Event()
+            self.event_writer_process = multiprocessing.Process(target=event_writer, args=(self.event_queue, self.event_writer_stop_event))
+            self.event_writer_process.daemon = True
+            self.event_writer_process.start()
+
+    def _start_reader(self, source):
+        try:
+            return self._launch_reader(source)
+        except Exception as e:
+            # e.g. too many open files or processes; undo whatever was registered for the source
+            print(f"[Main] Could not start reader for source {source}: {e}")
+            for per_source in (self.reader_processes, self.reader_frame_notification_queues, self.reader_stop_events, self.record_trigger_queues,
+                               self.encode_queues, self.encode_backlogs, self.recorder_memories):
+                per_source.pop(source, None)
+            if source in self.shm_prefixes:
+                reclaim_prefix(self.shm_prefixes.pop(source))
+            return False
+
+    def _launch_reader(self, source):
+        shm_prefix = source_prefix(os.getpid(), self.next_source_id)
+        self.next_source_id += 1
+        self.shm_prefixes[source] = shm_prefix
+
+        if self.reader_pool is not None:
+            slot = self.reader_pool.start_reader(source, shm_prefix)
+            self.reader_processes[source] = slot # Stands in for the reader Process
+            self.reader_frame_notification_queues[source] = slot.frame_notification_queue
+            self.reader_stop_events[source] = slot.stop_event
+            self.record_trigger_queues[source] = slot.record_trigger_queue
+            self.encode_queues[source] = slot.encode_queue
+            self.encode_backlogs[source] = slot.encode_backlog
+            self.recorder_memories[source] = slot.recorder_memory
+            print(f"Started pooled CameraReader for source: {source} in reader process {slot.pool_process.pool_id} with shared memory prefix: {shm_prefix}")
+            return True
+
+        frame_notification_queue = multiprocessing.Queue(maxsize=10) # Buffer for a few frame notifications
+        reader_stop_event = multiprocessing.Event()
+        self.record_trigger_queues[source] = multiprocessing.Queue(maxsize=100)
+        self.encode_queues[source] = multiprocessing.Queue(maxsize=64) # Chunks of frames, bounded so a slow encoder drops clip frames
+        self.encode_backlogs[source] = multiprocessing.Value('i', 0)
+        self.recorder_memories[source] = multiprocessing.Value('q', 0)
+        reader_p = multiprocessing.Process(target=camera_reader, args=(source, shm_prefix, frame_notification_queue, reader_stop_event,
+                                                                       self.record_trigger_queues[source], self.encode_queues[source],
+                                                                       self.encode_backlogs[source], self.recorder_memories[source]))
+        reader_p.daemon = True
+        reader_p.start()
+        self.reader_processes[source] = reader_p
+        self.reader_frame_notification_queues[source] = frame_notification_queue
+        self.reader_stop_events[source] = reader_stop_event
+        print(f"Started CameraReader for source: {source} with shared memory prefix: {shm_prefix}")
+        return True
+
+    def start_reader(self, source):
+        """Starts a reader for a source without a worker, e.g. to consume its frame notifications directly."""
+        if source in self.reader_processes and self.reader_processes[source].is_alive():
+            return True
+        if source in self.reader_processes:
+            self._stop_reader(source)
+        return self._start_reader(source)
+
+    def _stop_reader(self, source):
+        self.reader_stop_events[source].set() # Signal reader to stop
+        if self.reader_processes[source].is_alive():
+            self.reader_processes[source].join(timeout=1) # Give it a moment to clean up
+            if self.reader_processes[source].is_alive():
+                self.reader_processes[source].terminate() # Force terminate if not stopped
+        if self.reader_pool is not None:
+            self.reader_pool.release(self.reader_processes[source])
+        # Unlink whatever shared memory a terminated reader could not release itself
+        reclaim_prefix(self.shm_prefixes.pop(source))
+        del self.reader_processes[source]
+        del self.reader_stop_events[source]
+        del self.reader_frame_notification_queues[source]
+        for per_source in (self.record_trigger_queues, self.encode_queues, self.encode_backlogs, self.recorder_memories):
+            per_source.pop(source, None)
+
+        # Stop the encoder after the reader so it finishes the clips already handed over
+        if source in self.encoder_stop_events:
+            self.encoder_stop_events[source].set()
+            self.encoder_processes[source].join(timeout=5)
+            if self.encoder_processes[source].is_alive():
+                self.encoder_processes[source].terminate()
+            del self.encoder_processes[source]
+            del self.encoder_stop_events[source]
+
+    def _start_clip_encoder(self, source):
+        if source in self.encoder_processes and self.encoder_processes[source].is_alive():
+            return
+        encoder_stop_event = multiprocessing.Event()
+        encoder_p = multiprocessing.Process(target=clip_encoder, args=(source, self.encode_queues[source], encoder_stop_event, self.encode_backlogs[source]))
+        encoder_p.daemon = True
+        encoder_p.start()
+        self.encoder_processes[source] = encoder_p
+        self.encoder_stop_events[source] = encoder_stop_event
+        print(f"Started ClipEncoder for source: {source}")
+
+    def _stop_worker(self, camera_id):
+        if camera_id not in self.camera_processes:
+            return
+        self.camera_stop_events[camera_id].set() # Signal worker to stop
+        if self.camera_processes[camera_id].is_alive():
+            self.camera_processes[camera_id].join(timeout=1) # Give it a moment to clean up
+            if self.camera_processes[camera_id].is_alive():
+                self.camera_processes[camera_id].terminate() # Force terminate if not stopped
+        del self.camera_processes[camera_id]
+        del self.camera_queues[camera_id]
+        del self.camera_stop_events[camera_id]
+        del self.thread_budgets[camera_id]
+        del self.inference_rates[camera_id]
+        self.resource_assignments.pop(camera_id, None)
+        # Release this camera's hold on the recorder; it stops buffering once no camera holds it
+        source = self.armed_sources.pop(camera_id, None)
+        if source is not None and source in self.record_trigger_queues:
+            self._send_recorder_message(source, ('disarm', camera_id))
+
+    def _send_recorder_message(self, source, message):
+        try:
+            self.record_trigger_queues[source].put(message, timeout=1)
+        except _queue.Full:
+            print(f"[Main] Could not send '{message[0]}' to the recorder of source {source}: trigger queue full.")
+
+    def _rebalance(self):
+        """Re-splits the cores between the running workers: pins each one and updates its thread budget."""
+        self.resource_assignments = self.scheduler.plan(sorted(self.camera_processes))
+        for camera_id, assignment in self.resource_assignments.items():
+            self.thread_budgets[camera_id].value = assignment['threads']
+            pinned = set_process_affinity(self.camera_processes[camera_id].pid, assignment['cpus'])
+            assignment['pinned'] = pinned
+            print(f"[ResourceScheduler] Camera {camera_id}: {assignment['threads']} threads on CPUs {format_cpus(assignment['cpus'])}" + ("" if pinned else " (affinity not supported, threads only)"))
+
+    def _replan(self, camera_id, config):
+        """Plans all cameras including a new one. Returns its config with the plan applied if auto-assigning.
+
+        Running cameras whose model or input size changes are restarted; rate changes are applied live.
+        """
+        assignments, warnings = self.planner.plan({**self.camera_configs, camera_id: config})
+        self.capacity_plan = assignments
+        for warning in warnings:
+            print(f"[CapacityPlanner] Warning: {warning}")
+        verb = "Assigned" if self.planner.auto_assign else "Recommended"
+        for cid, assignment in assignments.items():
+            print(f"[CapacityPlanner] {verb} {format_assignment(cid, assignment)}")
+        if not self.planner.auto_assign:
+            return config
+
+        for other_id, assignment in assignments.items():
+            if other_id == camera_id or other_id not in self.camera_processes:
+                continue
+            old = self.camera_configs[other_id]
+            new = {**old, **{key: assignment[key] for key in PLANNED_KEYS}}
+            if (new['model_name'], new['imgsz']) != (old['model_name'], old['imgsz']):
+                self._start_worker(other_id, new)
+            elif new['inference_fps'] != old['inference_fps']:
+                self.camera_configs[other_id] = new
+                self.inference_rates[other_id].value = new['inference_fps']
+        if camera_id in assignments:
+            config = {**config, **{key: assignments[camera_id][key] for key in PLANNED_KEYS}}
+        return config
+
+    def start_camera(self, camera_id, config):
+        """Starts (or restarts with a new config) the worker for a camera, starting its source's reader if needed."""
+        if self.planner is not None:
+            config = self._replan(camera_id, config)
+        if not self._start_worker(camera_id, config):
+            return False
+        self._rebalance()
+        return True
+
+    def _start_worker(self, camera_id, config):
+        source = config['source']
+        model_name = config['model_name']
+        target_classes = config['target_classes']
+        enable_face_detection = config['enable_face_detection']
+
+        if source not in self.reader_processes or not self.reader_processes[source].is_alive():
+            if source in self.reader_processes:
+                self._stop_reader(source) # Reader died; release its resources before starting a new one
+            if not self._start_reader(source):
+                return False
+        frame_notification_queue = self.reader_frame_notification_queues[source]
+
+        # Clean up existing worker if any
+        self._stop_worker(camera_id)
+
+        recording_config = None
+        if config.get('enable_recording'):
+            self._start_clip_encoder(source)
+            recording_config = {
+                'record_classes': target_classes,
+                'min_confidence': config['record_min_confidence'],
+                'pre_roll_seconds': config['pre_roll_seconds'],
+                'post_roll_seconds': config['post_roll_seconds']
+            }
+            # Armed per camera so that the recorder is disarmed when the last recording camera stops
+            self._send_recorder_message(source, ('arm', camera_id, config['pre_roll_seconds'], config['post_roll_seconds']))
+            self.armed_sources[camera_id] = source
+
+        detector_options = {'imgsz': config.get('imgsz')}
+        if config.get('enable_tiling'):
+            detector_options.update({
+                'tile_size': config['tile_size'],
+                'tile_overlap': config['tile_overlap'],
+                'full_frame_pass': config['tile_full_frame'],
+                'regions': config['tile_regions']
+            })
+
+        output_queue = multiprocessing.Queue(maxsize=1) # Buffer for one frame
+        stop_event = multiprocessing.Event()
+        # Start on the budget this camera will get so the model never loads with a full thread pool
+        thread_budget = multiprocessing.Value('i', self.scheduler.plan(sorted(set(self.camera_processes) | {camera_id}))[camera_id]['threads'])
+        inference_rate = multiprocessing.Value('d', config.get('inference_fps') or 0)
+
+        # Pass the notification queue to the worker; it names the shared memory block of each frame
+        p = multiprocessing.Process(target=camera_worker, args=(camera_id, frame_notification_queue, output_queue, stop_event, model_name, target_classes, enable_face_detection,
+                                                                self.event_queue, self.record_trigger_queues[source], recording_config, detector_options,
+                                                                thread_budget, inference_rate))
+        p.daemon = True # Allow main process to exit even if workers are running
+        p.start()
+
+        self.camera_configs[camera_id] = dict(config)
+        self.camera_processes[camera_id] = p
+        self.camera_queues[camera_id] = output_queue
+        self.camera_stop_events[camera_id] = stop_event
+        self.thread_budgets[camera_id] = thread_budget
+        self.inference_rates[camera_id] = inference_rate
+        print(f"Started/Restarted worker for Camera {camera_id} (source {source}) with target classes: {target_classes}, Face Detection: {enable_face_detection}")
+        return True
+
+    def stop_camera(self, camera_id):
+        """Stops a camera's worker, and its source's reader if no other camera uses it."""
+        config = self.camera_configs.pop(camera_id, None)
+        self._stop_worker(camera_id)
+        if config is None:
+            return
+        source = config['source']
+        if source in self.reader_processes and not any(c['source'] == source for c in self.camera_configs.values()):
+            self._stop_reader(source)
+        print(f"Stopped Camera {camera_id} (source {source})")
+        self._rebalance() # Hand the freed cores to the remaining workers
+
+    def failed_cameras(self):
+        """Returns {camera_id: reason} for running cameras whose reader or worker has exited on its own.
+
+        A reader exits when its source cannot be opened or stops delivering frames; a worker when it crashes,
+        e.g. because its model cannot be loaded.
+        """
+        failed = {}
+        for camera_id, config in self.camera_configs.items():
+            reader = self.reader_processes.get(config['source'])
+            worker = self.camera_processes.get(camera_id)
+            if reader is None or not reader.is_alive():
+                failed[camera_id] = f"reader for source {config['source']} stopped"
+            elif worker is None or not worker.is_alive():
+                failed[camera_id] = "worker exited"
+        return failed
+
+    def poll_outputs(self):
+        """Returns the (camera_id, annotated_frame, records) items the workers have produced since the last call."""
+        outputs = []
+        for cam_id, q in list(self.camera_queues.items()):
+            try:
+                item = q.get_nowait()
+            except _queue.Empty:
+                # nothing to do this cycle
+                continue
+            except Exception as e:
+                print(f"[Main] Error reading from camera {cam_id} queue: {e}")
+                continue
+
+            # only accept (id, frame, detections) tuples
+            if not (isinstance(item, tuple) and len(item) == 3):
+                # skip over notifications or stray ints
+                continue
+            outputs.append(item)
+        return outputs
+
+    def recorder_stats(self, source):
+        """Returns (ring bytes, encode backlog frames) for a source, or None if it has no reader."""
+        if source not in self.encode_backlogs:
+            return None
+        return self.recorder_memories[source].value, self.encode_backlogs[source].value
+
+    def resource_summary(self, camera_id):
+        """Returns e.g. 'CPUs 1-3 · 3 threads' for a camera's worker, or None if it is not running."""
+        assignment = self.resource_assignments.get(camera_id)
+        if assignment is None:
+            return None
+        summary = f"{assignment['threads']} threads"
+        if assignment.get('pinned'):
+            summary = f"CPUs {format_cpus(assignment['cpus'])} · {summary}"
+        config = self.camera_configs[camera_id]
+        if config.get('inference_fps'):
+            summary += f" · {config['model_name']} @ {config['imgsz'] or 'default'}px, {config['inference_fps']:g} fps"
+        return summary
+
+    def shutdown(self):
+        # Terminate worker processes
+        for camera_id in list(self.camera_processes.keys()):
+            self._stop_worker(camera_id)
+        print("All worker processes terminated.")
+
+        # Terminate reader processes, unlink shared memory and stop encoders
+        for source in list(self.reader_processes.keys()):
+            self._stop_reader(source)
+        if self.reader_pool is not None:
+            self.reader_pool.shutdown()
+        print("All reader processes, encoders and shared memories terminated/unlinked.")
+
+        # Stop the event writer last so it can flush what the workers sent
+        if self.event_writer_process is not None:
+            self.event_writer_stop_event.set()
+            self.event_writer_process.join(timeout=3)
+            if self.event_writer_process.is_alive():
+                self.event_writer_process.terminate()
+            print("Event writer stopped.")
@@ -0,0 +1,149 @@
+import multiprocessing
+import threading
+import time
+import queue as _queue
+
+from core.camera_reader import camera_reader
+
+
+class ReaderSlot:
+    """One source's place in a pooled reader process.
+
+    The queues, values and events are created with the pool process so they can be inherited
+    by it; the pipeline hands them to workers and encoders exactly as it would for a reader
+    running in its own process. A slot also stands in for the reader's Process handle.
+    """
+
+    def __init__(self, pool_process, index):
+        self.pool_process = pool_process
+        self.index = index
+        self.source = None
+        self.stop_event = multiprocessing.Event()
+        self.running = multiprocessing.Value('b', 0)
+        self.frame_notification_queue = multiprocessing.Queue(maxsize=10) # Buffer for a few frame notifications
+        self.record_trigger_queue = multiprocessing.Queue(maxsize=100)
+        self.encode_queue = multiprocessing.Queue(maxsize=64) # Chunks of frames, bounded so a slow encoder drops clip frames
+        self.encode_backlog = multiprocessing.Value('i', 0)
+        self.recorder_memory = multiprocessing.Value('q', 0)
+
+    def ipc_args(self):
+        return (self.stop_event, self.running, self.frame_notification_queue, self.record_trigger_queue,
+                self.encode_queue, self.encode_backlog, self.recorder_memory)
+
+    # Process-like interface used by CameraPipeline
+    def is_alive(self):
+        return self.pool_process.process.is_alive() and bool(self.running.value)
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.is_alive() and (deadline is None or time.time() < deadline):
+            time.sleep(0.01)
+
+    def terminate(self):
+        # A thread cannot be killed; the slot stays out of use until its thread exits
+        print(f"[ReaderPool] Reader thread for source {self.source} did not stop in time.")
+
+
+class _ReaderPoolProcess:
+    def __init__(self, pool_id, slot_count):
+        self.pool_id = pool_id
+        self.command_queue = multiprocessing.Queue()
+        self.slots = [ReaderSlot(self, i) for i in range(slot_count)]
+        self.process = multiprocessing.Process(target=reader_pool_process,
+                                               args=(pool_id, self.command_queue, [slot.ipc_args() for slot in self.slots]))
+        self.process.daemon = True
+        self.process.start()
+
+    def free_slot(self):
+        for slot in self.slots:
+            if slot.source is None and not slot.running.value:
+                return slot
+        return None
+
+
+def _drain(q):
+    while True:
+        try:
+            q.get_nowait()
+        except (_queue.Empty, OSError, ValueError):
+            return
+
+
+class ReaderPool:
+    """Runs camera readers as threads, sources_per_process at a time, inside a few reader processes.
+
+    OpenCV releases the GIL while capturing and decoding, so one process can keep several
+    sources fed while saving the per-process memory and start-up cost of a reader each.
+    """
+
+    def __init__(self, sources_per_process=8):
+        self.sources_per_process = max(1, sources_per_process)
+        self.pool_processes = []
+
+    def start_reader(self, source, shm_prefix):
+        slot = None
+        for pool_process in self.pool_processes:
+            if pool_process.process.is_alive():
+                slot = pool_process.free_slot()
+                if slot is not None:
+                    break
+        if slot is None:
+            pool_process = _ReaderPoolProcess(len(self.pool_processes), self.sources_per_process)
+            self.pool_processes.append(pool_process)
+            print(f"[ReaderPool] Started reader process {pool_process.pool_id} with {self.sources_per_process} slots.")
+            slot = pool_process.slots[0]
+
+        # Clear anything a previous source left in this slot
+        for q in (slot.frame_notification_queue, slot.record_trigger_queue, slot.encode_queue):
+            _drain(q)
+        slot.encode_backlog.value = 0
+        slot.recorder_memory.value = 0
+        slot.stop_event.clear()
+        slot.running.value = 1 # Alive from the caller's point of view until the thread says otherwise
+        slot.source = source
+        slot.pool_process.command_queue.put(('start', slot.index, source, shm_prefix))
+        return slot
+
+    def release(self, slot):
+        slot.stop_event.set()
+        slot.source = None
+
+    def shutdown(self):
+        for pool_process in self.pool_processes:
+            pool_process.command_queue.put(('shutdown',))
+        for pool_process in self.pool_processes:
+            pool_process.process.join(timeout=2)
+            if pool_process.process.is_alive():
+                pool_process.process.terminate()
+        self.pool_processes = []
+
+
+def _run_pooled_reader(source, shm_prefix, slot_args):
+    stop_event, running, frame_notification_queue, record_trigger_queue, encode_queue, encode_backlog, recorder_memory = slot_args
+    try:
+        camera_reader(source, shm_prefix, frame_notification_queue, stop_event,
+                      record_trigger_queue, encode_queue, encode_backlog, recorder_memory)
+    except Exception as e:
+        print(f"[ReaderPool] Reader for source {source} failed: {e}")
+    finally:
+        running.value = 0
+
+
+def reader_pool_process(pool_id, command_queue, slots):
+    print(f"[ReaderPool {pool_id}] Starting with {len(slots)} slots.")
+    threads = {}
+    while True:
+        command = command_queue.get()
+        if command[0] == 'start':
+            _, index, source, shm_prefix = command
+            thread = threading.Thread(target=_run_pooled_reader, args=(source, shm_prefix, slots[index]), daemon=True)
+            thread.start()
+            threads[index] = thread
+        elif command[0] == 'shutdown':
+            break
+
+    for index, thread in threads.items():
+        slots[index][0].set() # Stop event
+    for thread in threads.values():
+        thread.join(timeout=1)
+    print(f"[ReaderPool {pool_id}] Exiting.")
@@ -0,0 +1,305 @@
+import os
+import time
+import threading
+import queue as _queue
+from collections import deque
+
+import cv2
+import numpy as np
+
+CLIPS_DIR = "clips"
+DEFAULT_PRE_ROLL_SECONDS = 5
+DEFAULT_POST_ROLL_SECONDS = 5
+DEFAULT_JPEG_QUALITY = 80 # Set to None to keep raw frames in the ring
+FRAMES_PER_CHUNK = 15 # Frames sent to the encoder per queue message
+TRIGGER_INTERVAL = 0.5 # Minimum seconds between triggers sent by one worker
+HANDOFF_FRAMES = 8 # Frames waiting for compression before the capture loop starts dropping clip frames
+CONTROL_PUT_TIMEOUT = 5.0 # Seconds the helper waits to send a clip start/end to the encoder
+CLIP_IDLE_TIMEOUT = 30.0 # Encoder finalizes clips that receive nothing for this long (lost 'end')
+
+
+def recording_rule_matches(results, class_names, record_classes, min_confidence):
+    """Returns True if any detection is one of record_classes (any class if empty) with enough confidence."""
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        classes = boxes.cls.cpu().numpy().astype(int)
+        confs = boxes.conf.cpu().numpy()
+        for cls, conf in zip(classes, confs):
+            if conf < min_confidence:
+                continue
+            name = class_names[cls] if class_names else str(cls)
+            if not record_classes or name in record_classes:
+                return True
+    return False
+
+
+class ClipRecorder:
+    """Keeps a pre-roll ring of recent frames and streams clips to an encoder process when triggered.
+
+    Runs inside the reader process. Nothing is buffered until a worker arms the recorder
+    through the trigger queue, so sources without recording enabled pay no memory cost.
+    JPEG compression and all queue traffic happen on a helper thread; the capture loop only
+    hands frames over and drops them if the helper falls behind.
+    """
+
+    def __init__(self, source, trigger_queue, encode_queue, encode_backlog=None, memory_usage=None,
+                 fps=15.0, jpeg_quality=DEFAULT_JPEG_QUALITY, clips_dir=CLIPS_DIR):
+        self.source = source
+        self.trigger_queue = trigger_queue
+        self.encode_queue = encode_queue
+        self.encode_backlog = encode_backlog # multiprocessing.Value shared with the encoder
+        self.memory_usage = memory_usage # multiprocessing.Value reporting ring size in bytes
+        self.fps = fps if fps and fps > 0 else 15.0
+        self.jpeg_quality = jpeg_quality
+        self.clips_dir = clips_dir
+
+        self.arms = {} # Arming worker (camera id) -> (pre_roll_seconds, post_roll_seconds)
+        self.armed = False
+        self.pre_roll_seconds = 0
+        self.post_roll_seconds = 0
+        self.ring = deque()
+        self.ring_bytes = 0
+
+        self.clip_id = None
+        self.clip_end = 0.0
+        self.clip_frames = []
+        self.clip_count = 0
+
+        # Capture loop -> helper thread; bounded so a slow helper costs dropped clip frames, never capture time
+        self.frames = _queue.Queue(maxsize=HANDOFF_FRAMES)
+        self.dropped_frames = 0
+        self.compress_ms = 0.0 # Moving average of the JPEG compression time per frame
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"ClipRecorder-{source}", daemon=True)
+        self.thread.start()
+
+    def _update_arms(self):
+        # Several workers may share a source; keep the longest rolls any of them asked for
+        if not self.arms:
+            if self.armed:
+                if self.clip_id is not None:
+                    self._finish_clip()
+                self.ring = deque()
+                self.ring_bytes = 0
+                if self.memory_usage is not None:
+                    self.memory_usage.value = 0
+                print(f"[ClipRecorder {self.source}] Disarmed; pre-roll ring released.")
+            self.armed = False
+            self.pre_roll_seconds = self.post_roll_seconds = 0
+            return
+        self.pre_roll_seconds = max(pre for pre, _ in self.arms.values())
+        self.post_roll_seconds = max(post for _, post in self.arms.values())
+        capacity = max(1, int(self.pre_roll_seconds * self.fps))
+        if self.ring.maxlen != capacity:
+            self.ring = deque(self.ring, maxlen=capacity)
+            self.ring_bytes = sum(len(data) if isinstance(data, bytes) else data.nbytes for _, data in self.ring)
+        if not self.armed:
+            print(f"[ClipRecorder {self.source}] Armed with {self.pre_roll_seconds}s pre-roll ({capacity} frames), {self.post_roll_seconds}s post-roll.")
+        self.armed = True
+
+    def _poll_triggers(self):
+        changed = False
+        while True:
+            try:
+                message = self.trigger_queue.get_nowait()
+            except _queue.Empty:
+                break
+            except Exception as e:
+                print(f"[ClipRecorder {self.source}] Error reading trigger queue: {e}")
+                break
+            kind = message[0]
+            if kind == 'arm':
+                _, owner, pre_roll_seconds, post_roll_seconds = message
+                self.arms[owner] = (pre_roll_seconds, post_roll_seconds)
+                changed = True
+            elif kind == 'disarm':
+                changed = self.arms.pop(message[1], None) is not None or changed
+            elif kind == 'trigger' and self.armed:
+                self._trigger(message[1])
+        if changed:
+            self._update_arms()
+
+    def _trigger(self, timestamp):
+        if self.clip_id is None:
+            os.makedirs(self.clips_dir, exist_ok=True)
+            self.clip_count += 1
+            clip_id = f"{self.source}-{self.clip_count}"
+            safe_source = "".join(c if c.isalnum() else "_" for c in str(self.source))
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+            path = os.path.join(self.clips_dir, f"{safe_source}_{stamp}_{self.clip_count}.mp4")
+            if not self._send_control(('start', clip_id, path, self.fps, self.jpeg_quality is not None)):
+                return # Without a start the encoder could not write the clip
+            self.clip_id = clip_id
+            # The pre-roll is sent as it is now; frames from here on go to the clip as they arrive
+            self.clip_frames = [data for _, data in self.ring]
+            self._flush_clip_frames()
+            print(f"[ClipRecorder {self.source}] Recording clip to {path}")
+        self.clip_end = max(self.clip_end, timestamp + self.post_roll_seconds)
+
+    def _send_control(self, message):
+        # Control messages must not be lost: a missing 'end' leaves the clip unfinalized in the encoder.
+        # Blocking here only stalls the helper thread, never capture.
+        try:
+            self.encode_queue.put(message, timeout=CONTROL_PUT_TIMEOUT)
+            return True
+        except _queue.Full:
+            print(f"[ClipRecorder {self.source}] Encoder not responding; could not send '{message[0]}' for clip {message[1]}.")
+            return False
+
+    def _flush_clip_frames(self):
+        if not self.clip_frames:
+            return
+        try:
+            self.encode_queue.put_nowait(('frames', self.clip_id, self.clip_frames))
+            if self.encode_backlog is not None:
+                with self.encode_backlog.get_lock():
+                    self.encode_backlog.value += len(self.clip_frames)
+        except _queue.Full:
+            print(f"[ClipRecorder {self.source}] Encoder queue full, dropping {len(self.clip_frames)} clip frames.")
+        self.clip_frames = []
+
+    def _finish_clip(self):
+        self._flush_clip_frames()
+        self._send_control(('end', self.clip_id))
+        self.clip_id = None
+        self.clip_end = 0.0
+
+    def _process_frame(self, frame, timestamp):
+        if self.jpeg_quality is not None:
+            start = time.perf_counter()
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            self.compress_ms = 0.9 * self.compress_ms + 0.1 * (time.perf_counter() - start) * 1000
+            if not ok:
+                return
+            data = encoded.tobytes()
+        else:
+            data = frame
+        data_size = len(data) if isinstance(data, bytes) else data.nbytes
+
+        if len(self.ring) == self.ring.maxlen:
+            oldest = self.ring[0][1]
+            self.ring_bytes -= len(oldest) if isinstance(oldest, bytes) else oldest.nbytes
+        self.ring.append((timestamp, data))
+        self.ring_bytes += data_size
+        if self.memory_usage is not None:
+            self.memory_usage.value = self.ring_bytes
+
+        if self.clip_id is not None:
+            self.clip_frames.append(data)
+            if len(self.clip_frames) >= FRAMES_PER_CHUNK:
+                self._flush_clip_frames()
+            if timestamp >= self.clip_end:
+                self._finish_clip()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self._poll_triggers()
+            try:
+                timestamp, frame = self.frames.get(timeout=0.1)
+            except _queue.Empty:
+                continue
+            if self.armed:
+                self._process_frame(frame, timestamp)
+        # Compress what capture already handed over so the running clip gets its last frames
+        while True:
+            try:
+                timestamp, frame = self.frames.get_nowait()
+            except _queue.Empty:
+                break
+            if self.armed:
+                self._process_frame(frame, timestamp)
+        if self.clip_id is not None:
+            self._finish_clip()
+
+    def add_frame(self, frame, timestamp=None):
+        """Hands a frame to the helper thread. Called from the capture loop; never blocks.
+
+        The frame must not be modified afterwards (cap.read() returns a new array per frame).
+        """
+        if not self.armed:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            self.frames.put_nowait((timestamp, frame))
+        except _queue.Full:
+            self.dropped_frames += 1
+
+    def close(self):
+        self.stopping.set()
+        self.thread.join(timeout=CONTROL_PUT_TIMEOUT + 1)
+
+    def stats(self):
+        backlog = self.encode_backlog.value if self.encode_backlog is not None else 0
+        return {'ring_frames': len(self.ring), 'ring_bytes': self.ring_bytes, 'encode_backlog': backlog,
+                'compress_ms': self.compress_ms, 'dropped_frames': self.dropped_frames}
+
+
+def clip_encoder(source, encode_queue, stop_event, encode_backlog=None):
+    print(f"[ClipEncoder {source}] Starting encoder.")
+    writers = {} # clip_id -> [path, fps, compressed, cv2.VideoWriter or None, last activity time]
+
+    def write_frames(clip_id, frames):
+        clip = writers.get(clip_id)
+        if clip is None:
+            # Clip was never started (or already finalized); its frames still count in the backlog
+            if encode_backlog is not None:
+                with encode_backlog.get_lock():
+                    encode_backlog.value -= len(frames)
+            return
+        clip[4] = time.time()
+        path, fps, compressed, writer, _ = clip
+        for data in frames:
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if compressed else data
+            if frame is not None:
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                    clip[3] = writer
+                writer.write(frame)
+            if encode_backlog is not None:
+                with encode_backlog.get_lock():
+                    encode_backlog.value -= 1
+
+    def handle(message):
+        kind = message[0]
+        if kind == 'start':
+            _, clip_id, path, fps, compressed = message
+            writers[clip_id] = [path, fps, compressed, None, time.time()]
+        elif kind == 'frames':
+            write_frames(message[1], message[2])
+        elif kind == 'end':
+            finish(message[1])
+
+    def finish(clip_id):
+        clip = writers.pop(clip_id, None)
+        if clip is not None and clip[3] is not None:
+            clip[3].release()
+            print(f"[ClipEncoder {source}] Finished clip {clip[0]}")
+
+    while not stop_event.is_set():
+        try:
+            message = encode_queue.get(timeout=0.5)
+        except _queue.Empty:
+            for clip_id, clip in list(writers.items()):
+                if time.time() - clip[4] > CLIP_IDLE_TIMEOUT:
+                    print(f"[ClipEncoder {source}] No end received for {clip[0]}; finalizing it.")
+                    finish(clip_id)
+            continue
+        try:
+            handle(message)
+        except Exception as e:
+            print(f"[ClipEncoder {source}] Error encoding clip: {e}")
+
+    # Finish whatever the reader already handed over
+    while True:
+        try:
+            handle(encode_queue.get_nowait())
+        except Exception:
+            break
+    for path, _, _, writer, _ in writers.values():
+        if writer is not None:
+            writer.release()
+    print(f"[ClipEncoder {source}] Exiting.")
@@ -0,0 +1,96 @@
+import os
+
+RESERVED_CORES = 1 # Left to the main process and the readers
+READER_CV2_THREADS = 1 # Readers only decode; one OpenCV thread each avoids oversubscription
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def format_cpus(cpus):
+    """Formats a CPU list compactly, e.g. [0, 1, 2, 5] -> '0-2,5'."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+class ResourceScheduler:
+    """Splits the CPU cores between inference workers.
+
+    Each worker gets a disjoint, contiguous set of cores and an intra-op thread count equal to
+    its size, so that N workers together never run more compute threads than there are cores.
+    With more workers than cores, each worker gets a single thread on a shared core.
+    """
+
+    def __init__(self, cpus=None, reserved_cores=RESERVED_CORES):
+        self.cpus = sorted(cpus) if cpus is not None else available_cpus()
+        self.reserved_cores = reserved_cores
+
+    def plan(self, worker_ids):
+        """Returns {worker_id: {'threads': n, 'cpus': [...]}} for the given workers."""
+        worker_ids = list(worker_ids)
+        if not worker_ids:
+            return {}
+        cpus = self.cpus[self.reserved_cores:] if len(self.cpus) > self.reserved_cores else self.cpus
+        plan = {}
+        if len(worker_ids) <= len(cpus):
+            base, extra = divmod(len(cpus), len(worker_ids))
+            start = 0
+            for i, worker_id in enumerate(worker_ids):
+                size = base + (1 if i < extra else 0)
+                plan[worker_id] = {'threads': size, 'cpus': cpus[start:start + size]}
+                start += size
+        else:
+            for i, worker_id in enumerate(worker_ids):
+                plan[worker_id] = {'threads': 1, 'cpus': [cpus[i % len(cpus)]]}
+        return plan
+
+
+def set_process_affinity(pid, cpus):
+    """Pins every thread of a process to the given CPUs. Returns False where affinity is not supported."""
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    # On Linux the affinity call applies to a single thread, so threads that already exist (torch/OpenMP
+    # pools, queue feeders) have to be pinned one by one; threads started later inherit their creator's mask
+    task_dir = f"/proc/{pid}/task"
+    try:
+        tids = [int(tid) for tid in os.listdir(task_dir)] if os.path.isdir(task_dir) else [pid]
+    except OSError:
+        tids = [pid]
+    try:
+        os.sched_setaffinity(pid, cpus)
+    except (OSError, ValueError) as e:
+        print(f"[ResourceScheduler] Could not set CPU affinity of process {pid}: {e}")
+        return False
+    for tid in tids:
+        if tid == pid:
+            continue
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            pass # Thread exited in the meantime
+        except (OSError, ValueError) as e:
+            print(f"[ResourceScheduler] Could not set CPU affinity of thread {tid} of process {pid}: {e}")
+            return False
+    return True
+
+
+def apply_thread_budget(threads):
+    """Caps the torch, OpenMP and OpenCV thread pools of the calling process."""
+    # Only takes effect before torch is first imported; set_num_threads below covers later changes
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
@@ -0,0 +1,159 @@
+import os
+import platform
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+SHM_PREFIX = "cdet" # Kept short: macOS limits shared memory names to 31 characters
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), "camera_detection_shm")
+MAX_IDLE_BLOCKS = 2 # Released blocks kept per process for reuse
+PAGE_SIZE = 4096
+
+
+def source_prefix(app_pid, source_id):
+    """Returns the name prefix for a source's blocks: cdet_<app pid>_<source id>."""
+    return f"{SHM_PREFIX}_{app_pid}_{source_id}"
+
+
+def _registry_path(name):
+    # Blocks are registered under the pid of the application that owns them
+    app_pid = name.split('_')[1]
+    return os.path.join(REGISTRY_DIR, app_pid, name)
+
+
+def _register(name):
+    path = _registry_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def _unregister(name):
+    try:
+        os.remove(_registry_path(name))
+    except OSError:
+        pass
+
+
+def _unlink(name):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()
+    return True
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Exists but belongs to someone else
+    return True
+
+
+def reclaim_stale_segments():
+    """Unlinks blocks registered by application instances that are no longer running."""
+    if platform.system() == "Windows":
+        return 0 # Windows frees shared memory with its last handle; nothing can be left behind
+    if not os.path.isdir(REGISTRY_DIR):
+        return 0
+    reclaimed = 0
+    for app_pid in os.listdir(REGISTRY_DIR):
+        app_dir = os.path.join(REGISTRY_DIR, app_pid)
+        if not app_pid.isdigit() or _pid_alive(int(app_pid)):
+            continue
+        for name in os.listdir(app_dir):
+            if _unlink(name):
+                reclaimed += 1
+            _unregister(name)
+        try:
+            os.rmdir(app_dir)
+        except OSError:
+            pass
+    if reclaimed:
+        print(f"[SharedMemoryPool] Reclaimed {reclaimed} stale shared memory blocks from a previous run.")
+    return reclaimed
+
+
+def reclaim_prefix(prefix):
+    """Unlinks any registered blocks left behind by a reader that was stopped or terminated."""
+    app_dir = os.path.dirname(_registry_path(prefix + "_0"))
+    if not os.path.isdir(app_dir):
+        return
+    for name in os.listdir(app_dir):
+        if name.startswith(prefix + "_"):
+            _unlink(name)
+            _unregister(name)
+
+
+class SharedMemoryPool:
+    """Hands out shared memory blocks sized to the frames that will be written to them.
+
+    Released blocks are kept for reuse by the same source, e.g. after a resolution change, and are
+    destroyed by release_prefix() when the source's reader stops; they are never shared between sources.
+    Every block is registered under its deterministic name before it is created, so blocks
+    orphaned by a crash can be found and unlinked by reclaim_stale_segments().
+    """
+
+    def __init__(self):
+        self.idle = [] # Released blocks, oldest first
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, prefix, size):
+        size = (size + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+        with self.lock:
+            # Reuse an idle block of this source if one fits without wasting more than half of it
+            for shm in self.idle:
+                if shm.name.startswith(prefix + "_") and size <= shm.size <= size * 2:
+                    self.idle.remove(shm)
+                    return shm
+            self.generation += 1
+            name = f"{prefix}_{self.generation}"
+        _register(name)
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except Exception:
+            _unregister(name)
+            raise
+
+    def release(self, shm):
+        with self.lock:
+            self.idle.append(shm)
+            evicted = self.idle[:-MAX_IDLE_BLOCKS] if len(self.idle) > MAX_IDLE_BLOCKS else []
+            self.idle = self.idle[len(evicted):]
+        for block in evicted:
+            self._destroy(block)
+
+    def release_prefix(self, prefix):
+        """Destroys the idle blocks of a source that has stopped."""
+        with self.lock:
+            mine = [shm for shm in self.idle if shm.name.startswith(prefix + "_")]
+            self.idle = [shm for shm in self.idle if shm not in mine]
+        for shm in mine:
+            self._destroy(shm)
+
+    @staticmethod
+    def _destroy(shm):
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        _unregister(shm.name)
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Returns the pool shared by all readers running in this process."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = SharedMemoryPool()
+        return _process_pool
@@ -0,0 +1,278 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 8080
+JPEG_QUALITY = 75
+# Output resolution tiers as a fraction of the camera resolution. Each (camera, tier)
+# is encoded at most once per frame no matter how many clients are watching it.
+TIERS = {'full': 1.0, 'medium': 0.5, 'low': 0.25}
+DEFAULT_TIER = 'medium'
+BOUNDARY = "frame"
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html><head><title>Camera Detection System</title>
+<style>body {{ background: #2c3e50; color: #ecf0f1; font-family: sans-serif; }} img {{ margin: 8px; }}</style>
+</head><body><h1>Cameras</h1>{images}</body></html>
+"""
+
+
+class _CameraChannel:
+    def __init__(self):
+        self.frame = None # Latest raw frame from the pipeline
+        self.frame_seq = 0
+        self.detections = []
+        self.updated_at = 0.0
+        self.encoded = {} # tier -> (frame_seq, jpeg bytes)
+        self.viewers = {tier: 0 for tier in TIERS}
+
+
+class StreamServer:
+    """Serves annotated camera frames over HTTP as MJPEG, plus the latest detections as JSON.
+
+    Frames are published from the main process. A single encoder thread compresses each new
+    frame once per tier that has viewers, and every client of that tier is served the same
+    bytes. Clients that fall behind skip straight to the newest frame instead of queueing.
+    """
+
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT, jpeg_quality=JPEG_QUALITY):
+        self.host = host
+        self.port = port
+        self.jpeg_quality = jpeg_quality
+        self.channels = {}
+        self.condition = threading.Condition()
+        self.running = False
+        self.httpd = None
+        self.server_thread = None
+        self.encoder_thread = None
+
+    def start(self):
+        server = self
+
+        class Handler(_StreamRequestHandler):
+            stream_server = server
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.running = True
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encoder_thread.start()
+        print(f"[StreamServer] Serving camera streams at http://{self.host}:{self.port}/")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        print("[StreamServer] Stopped.")
+
+    def publish(self, camera_id, frame, detections=None):
+        with self.condition:
+            channel = self.channels.setdefault(camera_id, _CameraChannel())
+            channel.frame = frame
+            channel.frame_seq += 1
+            if detections is not None:
+                channel.detections = detections
+            channel.updated_at = time.time()
+            self.condition.notify_all()
+
+    def remove_camera(self, camera_id):
+        with self.condition:
+            self.channels.pop(camera_id, None)
+            self.condition.notify_all()
+
+    def _encode_loop(self):
+        encoded_upto = {} # (camera_id, tier) -> frame_seq
+        while True:
+            with self.condition:
+                jobs = self._pending_jobs(encoded_upto)
+                while self.running and not jobs:
+                    self.condition.wait()
+                    jobs = self._pending_jobs(encoded_upto)
+                if not self.running:
+                    return
+
+            # Encode outside the lock; cv2 releases the GIL while compressing
+            for camera_id, tier, frame_seq, frame in jobs:
+                encoded_upto[(camera_id, tier)] = frame_seq
+                scale = TIERS[tier]
+                if scale != 1.0:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    continue
+                with self.condition:
+                    channel = self.channels.get(camera_id)
+                    if channel is not None:
+                        channel.encoded[tier] = (frame_seq, jpeg.tobytes())
+                        self.condition.notify_all()
+
+    def _pending_jobs(self, encoded_upto):
+        jobs = []
+        for camera_id, channel in self.channels.items():
+            if channel.frame is None:
+                continue
+            for tier, viewers in channel.viewers.items():
+                if viewers > 0 and encoded_upto.get((camera_id, tier)) != channel.frame_seq:
+                    jobs.append((camera_id, tier, channel.frame_seq, channel.frame))
+        return jobs
+
+    def add_viewer(self, camera_id, tier):
+        """Registers a viewer of a published camera. Returns False if the camera is unknown."""
+        with self.condition:
+            # Channels are only created by publish, so clients cannot add cameras or grow the channel table
+            channel = self.channels.get(camera_id)
+            if channel is None:
+                return False
+            channel.viewers[tier] += 1
+            self.condition.notify_all()
+            return True
+
+    def remove_viewer(self, camera_id, tier):
+        with self.condition:
+            channel = self.channels.get(camera_id)
+            if channel is not None:
+                channel.viewers[tier] = max(0, channel.viewers[tier] - 1)
+                if channel.viewers[tier] == 0:
+                    channel.encoded.pop(tier, None) # Stop serving a stale frame once nobody keeps it fresh
+
+    def wait_for_jpeg(self, camera_id, tier, last_seq, timeout=5.0):
+        """Blocks until a frame newer than last_seq is encoded. Returns (seq, jpeg) or None on timeout."""
+        deadline = time.time() + timeout
+        with self.condition:
+            while self.running:
+                channel = self.channels.get(camera_id)
+                if channel is not None:
+                    encoded = channel.encoded.get(tier)
+                    if encoded is not None and encoded[0] != last_seq:
+                        return encoded
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+        return None
+
+    def detections_snapshot(self, camera_id=None):
+        with self.condition:
+            if camera_id is not None:
+                channel = self.channels.get(camera_id)
+                if channel is None:
+                    return None
+                return {'camera_id': camera_id, 'updated_at': channel.updated_at, 'detections': list(channel.detections)}
+            return [{'camera_id': cam_id, 'updated_at': channel.updated_at, 'detections': list(channel.detections)}
+                    for cam_id, channel in sorted(self.channels.items())]
+
+    def camera_ids(self):
+        with self.condition:
+            return sorted(self.channels.keys())
+
+    def has_camera(self, camera_id):
+        with self.condition:
+            return camera_id in self.channels
+
+
+class _StreamRequestHandler(BaseHTTPRequestHandler):
+    stream_server = None
+
+    def log_message(self, format, *args):
+        pass # Keep per-request noise out of the application log
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if not parts:
+                self._send_index()
+            elif parts == ['cameras']:
+                self._send_json(self.stream_server.camera_ids())
+            elif parts[0] == 'detections' and len(parts) <= 2:
+                camera_id = int(parts[1]) if len(parts) == 2 else None
+                snapshot = self.stream_server.detections_snapshot(camera_id)
+                if snapshot is None:
+                    self.send_error(404, "Unknown camera")
+                else:
+                    self._send_json(snapshot)
+            elif parts[0] in ('stream', 'snapshot') and len(parts) == 2:
+                camera_id = int(parts[1])
+                tier = params.get('tier', [DEFAULT_TIER])[0]
+                if tier not in TIERS:
+                    self.send_error(400, f"Unknown tier '{tier}', expected one of: {', '.join(TIERS)}")
+                elif parts[0] == 'stream':
+                    self._send_stream(camera_id, tier)
+                else:
+                    self._send_snapshot(camera_id, tier)
+            else:
+                self.send_error(404)
+        except ValueError:
+            self.send_error(400, "Camera id must be an integer")
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Client went away
+
+    def _send_index(self):
+        images = "".join(f'<div><h3>Camera {cam_id}</h3><img src="/stream/{cam_id}"></div>'
+                         for cam_id in self.stream_server.camera_ids())
+        body = INDEX_PAGE.format(images=images).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_snapshot(self, camera_id, tier):
+        if not self.stream_server.add_viewer(camera_id, tier):
+            self.send_error(404, "Unknown camera")
+            return
+        try:
+            encoded = self.stream_server.wait_for_jpeg(camera_id, tier, None)
+        finally:
+            self.stream_server.remove_viewer(camera_id, tier)
+        if encoded is None:
+            self.send_error(503, "No frame available")
+            return
+        jpeg = encoded[1]
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(jpeg)))
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+    def _send_stream(self, camera_id, tier):
+        if not self.stream_server.add_viewer(camera_id, tier):
+            self.send_error(404, "Unknown camera")
+            return
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            last_seq = None
+            while self.stream_server.running and self.stream_server.has_camera(camera_id):
+                # Always take the newest encoded frame; anything this client missed is dropped
+                encoded = self.stream_server.wait_for_jpeg(camera_id, tier, last_seq)
+                if encoded is None:
+                    continue
+                last_seq, jpeg = encoded
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode('ascii'))
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        finally:
+            self.stream_server.remove_viewer(camera_id, tier)
@@ -1,15 +1,28 @@
 import cv2
+import time
 import numpy as np
+import queue as _queue
 from multiprocessing import shared_memory
 
-from detection.object_detector import ObjectDetector
-from utils.camera_utils import draw_boxes
+from core.event_store import make_event_records
+from core.recorder import recording_rule_matches, TRIGGER_INTERVAL
+from core.resource_scheduler import apply_thread_budget
 
 from utils.camera_utils import draw_boxes, draw_faces
 
-def camera_worker(camera_id, shared_mem_name, shared_mem_size, frame_notification_queue, output_queue, stop_event, model_name, target_classes, enable_face_detection):
+def camera_worker(camera_id, frame_notification_queue, output_queue, stop_event, model_name, target_classes, enable_face_detection, event_queue=None, record_trigger_queue=None, recording_config=None, detector_options=None, thread_budget=None, inference_rate=None):
     print(f"[CameraWorker {camera_id}] Starting with model: {model_name}, target classes: {target_classes}")
-    detector = ObjectDetector(model_name=model_name)
+    # The pipeline sets the thread budget and may change it when cameras are added or removed
+    threads = None
+    if thread_budget is not None:
+        threads = thread_budget.value
+        apply_thread_budget(threads)
+        print(f"[CameraWorker {camera_id}] Using {threads} inference threads")
+    # Imported here so that only inference processes load ultralytics/torch, never the GUI or the readers
+    from detection.object_detector import ObjectDetector
+    detector = ObjectDetector(model_name=model_name, **(detector_options or {}))
+    if detector.tile_size:
+        print(f"[CameraWorker {camera_id}] Tiled inference enabled: {detector.tile_size}px tiles, {detector.tile_overlap:.0%} overlap, full-frame pass: {detector.full_frame_pass}")
 
     face_cascade = None
     if enable_face_detection:
@@ -20,21 +33,45 @@ def camera_worker(camera_id, shared_mem_name, shared_mem_size, frame_notificatio
         else:
             print(f"[CameraWorker {camera_id}] Face Detection Enabled.")
 
-    # Attach to the shared memory block
-    try:
-        shm = shared_memory.SharedMemory(name=shared_mem_name)
-        shared_buffer = shm.buf
-    except Exception as e:
-        print(f"[CameraWorker {camera_id}] Error attaching to shared memory: {e}")
-        stop_event.set()
-        return
+    # The reader names the shared memory block in each notification and may move to a new
+    # block when the stream resolution changes, so attach lazily and re-attach on change
+    shm = None
+    last_inference_time = 0.0
+
+    # The pipeline arms the reader's clip recorder for this camera; the worker only sends triggers
+    recording_enabled = record_trigger_queue is not None and recording_config is not None
+    last_trigger_time = 0.0
+    if recording_enabled:
+        print(f"[CameraWorker {camera_id}] Clip recording enabled for: {recording_config['record_classes'] or 'all classes'}")
 
     while not stop_event.is_set():
+        if thread_budget is not None and thread_budget.value != threads:
+            threads = thread_budget.value
+            apply_thread_budget(threads)
+            print(f"[CameraWorker {camera_id}] Rebalanced to {threads} inference threads")
+
         if not frame_notification_queue.empty():
-            frame_shape, frame_dtype = frame_notification_queue.get() # Get frame info from reader process
+            frame_shape, frame_dtype, shm_name = frame_notification_queue.get() # Get frame info from reader process
+
+            # Skip frames to hold the planned inference rate; the pipeline may change it while running
+            if inference_rate is not None and inference_rate.value > 0:
+                if time.time() - last_inference_time < 1.0 / inference_rate.value:
+                    continue
+                last_inference_time = time.time()
+
+            if shm is None or shm.name != shm_name:
+                try:
+                    new_shm = shared_memory.SharedMemory(name=shm_name)
+                except Exception as e:
+                    print(f"[CameraWorker {camera_id}] Error attaching to shared memory {shm_name}: {e}")
+                    continue
+                if shm is not None:
+                    frame = results = None # Drop views into the old block so it can be closed
+                    shm.close()
+                shm = new_shm
 
             # Reconstruct the frame from shared memory
-            frame = np.ndarray(frame_shape, dtype=frame_dtype, buffer=shared_buffer)
+            frame = np.ndarray(frame_shape, dtype=frame_dtype, buffer=shm.buf)
             annotated_frame = frame.copy() # Initialize annotated_frame with a copy of the original frame
 
             # Object Detection
@@ -47,15 +84,33 @@ def camera_worker(camera_id, shared_mem_name, shared_mem_size, frame_notificatio
 
             annotated_frame = draw_boxes(annotated_frame, results, target_classes, detector.model.names)
 
+            records = make_event_records(camera_id, results, target_classes, detector.model.names) if results else []
+
+            # Hand detections to the event writer; it batches them to disk off this process
+            if event_queue is not None and records:
+                try:
+                    event_queue.put_nowait(records)
+                except _queue.Full:
+                    pass # Writer is behind; drop this frame's events rather than stall inference
+
+            # Fire the clip recorder when the recording rule matches, rate-limited so the reader is not flooded
+            if recording_enabled and results and time.time() - last_trigger_time >= TRIGGER_INTERVAL:
+                if recording_rule_matches(results, detector.model.names, recording_config['record_classes'], recording_config['min_confidence']):
+                    last_trigger_time = time.time()
+                    try:
+                        record_trigger_queue.put_nowait(('trigger', last_trigger_time, camera_id))
+                    except _queue.Full:
+                        pass
+
             # Face Detection
             if enable_face_detection and face_cascade:
                 gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 faces = face_cascade.detectMultiScale(gray_frame, 1.1, 4)
                 annotated_frame = draw_faces(annotated_frame, faces)
 
-            # Put the annotated frame into the queue for the main process to display
+            # Put the annotated frame and its detections into the queue for the main process to display
             try:
-                output_queue.put_nowait((camera_id, annotated_frame))
+                output_queue.put_nowait((camera_id, annotated_frame, records))
             except _queue.Full:
                 # If the queue is full, the main process is not consuming fast enough.
                 # We can drop the frame to avoid blocking the worker.
@@ -64,5 +119,7 @@ def camera_worker(camera_id, shared_mem_name, shared_mem_size, frame_notificatio
             # Small sleep to prevent busy-waiting if no frames are available
             stop_event.wait(0.001) # Wait for a very short time or until stop_event is set
 
-    shm.close() # Close the shared memory connection
+    if shm is not None:
+        frame = results = None # Drop views into the block so it can be closed
+        shm.close() # Close the shared memory connection
     print(f"[CameraWorker {camera_id}] Exiting.")
\ No newline at end of file
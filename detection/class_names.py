@@ -0,0 +1,28 @@
+import os
+import re
+
+# Classes of the stock YOLO detection models, all trained on COCO. Listing them here lets the
+# GUI show class names without importing ultralytics/torch or loading a model.
+COCO_CLASSES = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+)
+
+# yolov8n.pt, yolov5su.pt, yolo11m.pt, ... but not -seg/-cls/-oiv7 variants or custom weights
+STOCK_COCO_MODEL = re.compile(r"^yolo(v\d+|\d+)[nsmlx]u?\.pt$")
+
+
+def get_class_names(model_name):
+    """Returns {class_id: name} for a model, loading the model only if it is not a stock COCO model."""
+    if STOCK_COCO_MODEL.match(os.path.basename(model_name)):
+        return dict(enumerate(COCO_CLASSES))
+    from detection.object_detector import ObjectDetector # Custom weights: only the model knows its classes
+    return dict(ObjectDetector(model_name=model_name).model.names)
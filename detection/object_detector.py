@@ -1,9 +1,77 @@
+import numpy as np
+import torch
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+from detection.tiling import tile_origins, nms, cut_at_tile_edge, DEFAULT_TILE_OVERLAP, DEFAULT_NMS_IOU, DEFAULT_NMS_CONTAINMENT
+
 
 class ObjectDetector:
-    def __init__(self, model_name="yolov8n.pt"):
+    def __init__(self, model_name="yolov8n.pt", tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP,
+                 full_frame_pass=True, regions=None, nms_iou=DEFAULT_NMS_IOU, imgsz=None,
+                 nms_containment=DEFAULT_NMS_CONTAINMENT):
         self.model = YOLO(model_name)
+        self.imgsz = imgsz # Inference size in pixels; None uses the model's default (640)
+        # Tiled mode is enabled by giving a tile size; regions are [x1, y1, x2, y2] fractions of the frame
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.full_frame_pass = full_frame_pass
+        self.regions = regions or None
+        self.nms_iou = nms_iou
+        self.nms_containment = nms_containment
 
     def detect(self, frame):
-        results = self.model(frame, verbose=False)
-        return results
\ No newline at end of file
+        if self.tile_size:
+            return self.detect_tiled(frame)
+        results = self.model(frame, **self._size_args(), verbose=False)
+        return results
+
+    def _size_args(self):
+        return {'imgsz': self.imgsz} if self.imgsz else {}
+
+    def _tile_windows(self, frame_shape):
+        h, w = frame_shape[:2]
+        overlap = int(self.tile_size * self.tile_overlap)
+        regions = self.regions or [[0.0, 0.0, 1.0, 1.0]]
+        windows = set()
+        for rx1, ry1, rx2, ry2 in regions:
+            x_start, y_start = int(rx1 * w), int(ry1 * h)
+            x_end, y_end = int(rx2 * w), int(ry2 * h)
+            for y in tile_origins(y_end - y_start, self.tile_size, overlap):
+                for x in tile_origins(x_end - x_start, self.tile_size, overlap):
+                    x0, y0 = x_start + x, y_start + y
+                    windows.add((x0, y0, min(x0 + self.tile_size, w), min(y0 + self.tile_size, h)))
+        return sorted(windows)
+
+    def detect_tiled(self, frame):
+        """Runs the model on overlapping tiles in one batch and merges the detections with cross-tile NMS."""
+        windows = self._tile_windows(frame.shape)
+        tiles = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+        tile_results = self.model(tiles, imgsz=self.tile_size, verbose=False)
+
+        all_boxes = []
+        all_fragments = []
+        for window, r in zip(windows, tile_results):
+            if r.boxes is not None and len(r.boxes):
+                data = r.boxes.data.cpu().numpy().copy()
+                data[:, [0, 2]] += window[0]
+                data[:, [1, 3]] += window[1]
+                all_boxes.append(data)
+                all_fragments.append(cut_at_tile_edge(data, window, frame.shape))
+
+        if self.full_frame_pass:
+            # Catches objects too large to fit in a single tile
+            full = self.model(frame, **self._size_args(), verbose=False)[0]
+            if full.boxes is not None and len(full.boxes):
+                all_boxes.append(full.boxes.data.cpu().numpy())
+                all_fragments.append(np.zeros(len(full.boxes), dtype=bool))
+
+        if all_boxes:
+            data = np.concatenate(all_boxes)[:, :6] # x1, y1, x2, y2, conf, cls
+            keep = nms(data[:, :4], data[:, 4], data[:, 5], self.nms_iou, self.nms_containment,
+                       np.concatenate(all_fragments))
+            data = data[keep]
+        else:
+            data = np.zeros((0, 6), dtype=np.float32)
+
+        return [Results(frame, path=None, names=self.model.names, boxes=torch.from_numpy(np.ascontiguousarray(data, dtype=np.float32)))]
@@ -0,0 +1,82 @@
+import numpy as np
+
+DEFAULT_TILE_SIZE = 640
+DEFAULT_TILE_OVERLAP = 0.2
+DEFAULT_NMS_IOU = 0.5
+DEFAULT_NMS_CONTAINMENT = 0.8 # Share of a tile-edge fragment inside another box above which both are one object
+TILE_EDGE_MARGIN = 2 # Pixels from a tile edge within which a box counts as cut by it
+
+
+def tile_origins(length, tile, overlap):
+    """Returns the start offsets of tiles of size `tile` covering `length` with at least `overlap` pixels shared."""
+    if length <= tile:
+        return [0]
+    stride = max(1, tile - overlap)
+    origins = list(range(0, length - tile, stride))
+    origins.append(length - tile) # Last tile is flush with the edge
+    return origins
+
+
+def cut_at_tile_edge(boxes, window, frame_shape, margin=TILE_EDGE_MARGIN):
+    """Flags the boxes (frame coordinates) of one tile that touch an edge of the tile lying inside the frame.
+
+    Such a box may be a fragment of an object that continues in the neighbouring tile. Tile edges
+    on the frame border cut nothing.
+    """
+    x0, y0, x1, y1 = window
+    h, w = frame_shape[:2]
+    return (((x0 > 0) & (boxes[:, 0] <= x0 + margin)) | ((y0 > 0) & (boxes[:, 1] <= y0 + margin))
+            | ((x1 < w) & (boxes[:, 2] >= x1 - margin)) | ((y1 < h) & (boxes[:, 3] >= y1 - margin)))
+
+
+def nms(boxes, scores, classes, iou_threshold=DEFAULT_NMS_IOU, containment_threshold=DEFAULT_NMS_CONTAINMENT,
+        fragments=None):
+    """Class-aware greedy NMS. Returns the indices of the kept boxes, in order of their best score.
+
+    Two boxes of the same class are merged if their IoU exceeds iou_threshold. If `fragments` flags
+    the boxes cut at a tile edge (see cut_at_tile_edge), a fragment is also merged into a box of the
+    same class holding more than containment_threshold of it (intersection over the fragment's
+    area): its IoU with the whole object, seen by another tile or the full-frame pass, is low.
+    A group merged that way is represented by its largest box. Boxes that are not fragments, such
+    as a distant person inside a nearer person's box, are only merged by IoU.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=int)
+    if fragments is None:
+        fragments = np.zeros(len(boxes), dtype=bool)
+    # Shift each class into its own coordinate range so boxes of different classes never overlap
+    offsets = classes.astype(np.float32)[:, None] * (boxes.max() + 1)
+    shifted = boxes + offsets
+    x1, y1, x2, y2 = shifted[:, 0], shifted[:, 1], shifted[:, 2], shifted[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+
+    def overlapping(i, others):
+        # Which of `others` are the same object as box i
+        w = np.clip(np.minimum(x2[i], x2[others]) - np.maximum(x1[i], x1[others]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[others]) - np.maximum(y1[i], y1[others]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[others] - inter + 1e-9)
+        # Containment only counts when the smaller box of the pair is a fragment
+        smaller_is_fragment = np.where(areas[others] < areas[i], fragments[others], fragments[i])
+        containment = inter / (np.minimum(areas[i], areas[others]) + 1e-9)
+        contained = smaller_is_fragment & (containment > containment_threshold)
+        return iou > iou_threshold, contained
+
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        rest = order[1:]
+        duplicate, contained = overlapping(i, rest)
+        suppressed = duplicate | contained
+        if contained.any():
+            kept = max([i, *rest[contained]], key=lambda j: areas[j]) # Fragments merge into the most complete box
+            if kept != i:
+                # Also drop what duplicates the kept box; what duplicated the fragment i goes with it
+                others = rest != kept
+                kept_duplicate, kept_contained = overlapping(kept, rest[others])
+                suppressed[others] |= kept_duplicate | kept_contained
+                i = kept
+        keep.append(i)
+        order = rest[~suppressed]
+    return np.array(keep, dtype=int)
@@ -18,11 +18,19 @@ class CameraFeed(QFrame):
         self.image_label.setText(f"Camera {camera_id}\nNo Feed")
         self.image_label.setStyleSheet("background-color: #000; color: #fff; font-size: 18px;")
         self.layout.addWidget(self.image_label)
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-size: 11px;")
+        self.status_label.hide()
+        self.layout.addWidget(self.status_label)
         self.setLayout(self.layout)
 
     def set_size(self, size):
         self.setMinimumSize(size, int(size * 0.75)) # Maintain 4:3 aspect ratio
 
+    def set_status(self, text):
+        self.status_label.setText(text)
+        self.status_label.setVisible(bool(text))
+
     def update_frame(self, frame):
         if frame is None:
             self.image_label.setText(f"Camera {self.camera_id}\nError/Disconnected")
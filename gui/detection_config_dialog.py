@@ -1,6 +1,6 @@
 
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QDialogButtonBox, QMessageBox, QScrollArea, QCheckBox, QWidget)
-from detection.object_detector import ObjectDetector
+from detection.class_names import get_class_names
 from gui.stylesheet import get_stylesheet
 
 class DetectionConfigDialog(QDialog):
@@ -22,10 +22,17 @@ class DetectionConfigDialog(QDialog):
         self.face_detection_checkbox.setChecked(current_config.get('enable_face_detection', False))
         layout.addWidget(self.face_detection_checkbox)
 
-        # Get all available classes from the model
+        self.recording_checkbox = QCheckBox("Record clips when selected classes are detected")
+        self.recording_checkbox.setChecked(current_config.get('enable_recording', False))
+        layout.addWidget(self.recording_checkbox)
+
+        self.tiling_checkbox = QCheckBox("Tiled inference for small, distant objects (slower)")
+        self.tiling_checkbox.setChecked(current_config.get('enable_tiling', False))
+        layout.addWidget(self.tiling_checkbox)
+
+        # Get all available classes from the model (stock models need no model load)
         try:
-            temp_detector = ObjectDetector(model_name=model_name)
-            self.all_classes = sorted(list(temp_detector.model.names.values()))
+            self.all_classes = sorted(list(get_class_names(model_name).values()))
         except Exception as e:
             QMessageBox.warning(self, "Model Load Error", f"Could not load model {model_name} to get class names: {e}. Please ensure the model is downloaded and accessible.")
             self.all_classes = [] # Fallback to empty list
@@ -79,5 +86,7 @@ class DetectionConfigDialog(QDialog):
                 selected_classes.append(checkbox.text())
         return {
             'target_classes': selected_classes,
-            'enable_face_detection': self.face_detection_checkbox.isChecked()
+            'enable_face_detection': self.face_detection_checkbox.isChecked(),
+            'enable_recording': self.recording_checkbox.isChecked(),
+            'enable_tiling': self.tiling_checkbox.isChecked()
         }
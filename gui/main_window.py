@@ -1,34 +1,25 @@
 
-import multiprocessing
-from multiprocessing import shared_memory
-import queue as _queue   # at top of file, so you can catch Empty
-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLineEdit,
                              QComboBox, QGridLayout, QMessageBox, QInputDialog, QLabel)
 from PyQt5.QtCore import QTimer, Qt
 from gui.stylesheet import get_stylesheet
 
-from core.workers import camera_worker
-from core.camera_reader import camera_reader
+from core.pipeline import CameraPipeline, camera_config_from_profile
+from core.capacity_planner import PLANNED_KEYS
+from core.stream_server import StreamServer
 from utils.profile_manager import save_profile
 from utils.camera_manager import get_camera_sources
 from gui.camera_feed import CameraFeed
 from gui.detection_config_dialog import DetectionConfigDialog
 
 class MainWindow(QWidget):
-    # Define a reasonable max frame size for shared memory (e.g., 1920x1080x3 bytes)
-    MAX_FRAME_SIZE = 2560 * 1440 * 3 # Increased to support 1440p resolution
-
-    def __init__(self, initial_configs=None):
+    def __init__(self, initial_configs=None, sources_per_reader_process=0, planner=None):
         super().__init__()
         self.setWindowTitle("Gemini Camera Detection System")
         self.setGeometry(100, 100, 1300, 900) # Adjusted window size
         self.setStyleSheet(get_stylesheet())
 
-        self.camera_processes = {} # Worker processes
-        self.camera_queues = {} # Queues for workers to send frames to main process
-        self.camera_stop_events = {} # Stop events for workers
         # camera_feeds will hold the container QWidget
         self.camera_feeds = {} # camera_feeds will hold the container QWidget
         self.camera_feed_widgets = {} # camera_feed_widgets holds the actual CameraFeed instances for update_frame()
@@ -38,16 +29,25 @@ class MainWindow(QWidget):
         self.cameras_per_page = 4 # Default value
         self.camera_size = 640 # Default value
 
-        self.reader_processes = {} # Reader processes
-        self.reader_frame_notification_queues = {} # Queues for readers to send frame info to workers
-        self.reader_stop_events = {} # Stop events for readers
-        self.shared_memories = {} # New: Store SharedMemory objects
+        # Reader, worker, encoder and event writer processes
+        self.pipeline = CameraPipeline(sources_per_reader_process=sources_per_reader_process, planner=planner)
+
+        # Remote viewing: annotated frames and detections are served over HTTP from this process
+        self.stream_server = StreamServer()
+        try:
+            self.stream_server.start()
+        except OSError as e:
+            print(f"Could not start stream server on port {self.stream_server.port}: {e}")
+            self.stream_server = None
 
         self.init_ui()
         self.populate_camera_sources()
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_feeds)
         self.timer.start(50) # Update every 30 ms
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_camera_status)
+        self.stats_timer.start(1000)
 
         if initial_configs:
             self.load_initial_configs(initial_configs)
@@ -126,19 +126,10 @@ class MainWindow(QWidget):
 
     def load_initial_configs(self, configs):
         for config in configs:
-            source = config['source']
-            model_name = config['model_name']
-            target_classes = config['target_classes']
-
             camera_id = self.camera_count
             self.camera_count += 1
 
-            self.camera_configs[camera_id] = {
-                'source': source,
-                'model_name': model_name,
-                'target_classes': target_classes,
-                'enable_face_detection': False # New: Default to False
-            }
+            self.camera_configs[camera_id] = camera_config_from_profile(config)
             self._add_camera_to_gui(camera_id)
         self._start_camera_worker(camera_id)
         self.update_grid() # Update grid after loading all initial configs
@@ -226,12 +217,11 @@ class MainWindow(QWidget):
         self.camera_count += 1
 
         # Initial config: detect all classes
-        self.camera_configs[camera_id] = {
+        self.camera_configs[camera_id] = camera_config_from_profile({
             'source': source,
             'model_name': model_name,
-            'target_classes': [], # Empty list means detect all
-            'enable_face_detection': False # New: Default to False
-        }
+            'target_classes': [] # Empty list means detect all
+        })
 
         self._add_camera_to_gui(camera_id)
         self._start_camera_worker(camera_id)
@@ -251,60 +241,26 @@ class MainWindow(QWidget):
         print(f"Added Camera {camera_id} from source {source} with model {model_name}")
 
     def _start_camera_worker(self, camera_id):
-        config = self.camera_configs[camera_id]
-        source = config['source']
-        model_name = config['model_name']
-        target_classes = config['target_classes']
-        enable_face_detection = config['enable_face_detection']
-
-        # --- New: Manage CameraReader process and Shared Memory ---
-        if source not in self.reader_processes or not self.reader_processes[source].is_alive():
-            # Create shared memory for this source
-            try:
-                shm = shared_memory.SharedMemory(create=True, size=self.MAX_FRAME_SIZE)
-                self.shared_memories[source] = shm
-                shared_mem_name = shm.name
-                shared_mem_size = shm.size
-            except Exception as e:
-                print(f"Error creating shared memory for source {source}: {e}")
-                return
-
-            frame_notification_queue = multiprocessing.Queue(maxsize=10) # Buffer for a few frame notifications
-            reader_stop_event = multiprocessing.Event()
-            reader_p = multiprocessing.Process(target=camera_reader, args=(source, shared_mem_name, shared_mem_size, frame_notification_queue, reader_stop_event))
-            reader_p.daemon = True
-            reader_p.start()
-            self.reader_processes[source] = reader_p
-            self.reader_frame_notification_queues[source] = frame_notification_queue
-            self.reader_stop_events[source] = reader_stop_event
-            print(f"Started CameraReader for source: {source} with shared memory: {shared_mem_name}")
-        else:
-            shared_mem_name = self.shared_memories[source].name
-            shared_mem_size = self.shared_memories[source].size
-            frame_notification_queue = self.reader_frame_notification_queues[source]
-
-        # Clean up existing worker if any
-        if camera_id in self.camera_processes and self.camera_processes[camera_id].is_alive():
-            self.camera_stop_events[camera_id].set()
-            self.camera_processes[camera_id].join(timeout=1)
-            if self.camera_processes[camera_id].is_alive():
-                self.camera_processes[camera_id].terminate()
-            del self.camera_processes[camera_id]
-            del self.camera_queues[camera_id]
-            del self.camera_stop_events[camera_id]
-
-        output_queue = multiprocessing.Queue(maxsize=1) # Buffer for one frame
-        stop_event = multiprocessing.Event()
-
-        # Pass shared memory details and notification queue to the worker
-        p = multiprocessing.Process(target=camera_worker, args=(camera_id, shared_mem_name, shared_mem_size, frame_notification_queue, output_queue, stop_event, model_name, target_classes, enable_face_detection))
-        p.daemon = True # Allow main process to exit even if workers are running
-        p.start()
-
-        self.camera_processes[camera_id] = p
-        self.camera_queues[camera_id] = output_queue
-        self.camera_stop_events[camera_id] = stop_event
-        print(f"Started/Restarted worker for Camera {camera_id} (source {source}) with target classes: {target_classes}, Face Detection: {enable_face_detection}")
+        self.pipeline.start_camera(camera_id, self.camera_configs[camera_id])
+        # The capacity planner may have changed the model, input size or rate of any camera
+        for cam_id, config in self.pipeline.camera_configs.items():
+            if cam_id in self.camera_configs:
+                self.camera_configs[cam_id].update({key: config[key] for key in PLANNED_KEYS})
+
+    def update_camera_status(self):
+        for camera_id, config in self.camera_configs.items():
+            widget = self.camera_feed_widgets.get(camera_id)
+            if widget is None:
+                continue
+            parts = []
+            resources = self.pipeline.resource_summary(camera_id)
+            if resources:
+                parts.append(resources)
+            stats = self.pipeline.recorder_stats(config['source'])
+            if config.get('enable_recording') and stats is not None:
+                ring_bytes, backlog = stats
+                parts.append(f"Rec buffer {ring_bytes / 1e6:.1f} MB | encode backlog {backlog}")
+            widget.set_status(" | ".join(parts))
 
     def open_detection_config(self, camera_id):
         current_config = self.camera_configs[camera_id]
@@ -336,48 +292,21 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Invalid Name", "Profile name cannot be empty.")
 
     def update_feeds(self):
-        for cam_id, q in self.camera_queues.items():
-            try:
-                item = q.get_nowait()
-            except _queue.Empty:
-                # nothing to do this cycle
-                continue
-            except Exception as e:
-                print(f"[Main] Error reading from camera {cam_id} queue: {e}")
-                continue
-
-            # only accept (id, frame) tuples
-            if not (isinstance(item, tuple) and len(item) == 2):
-                # skip over notifications or stray ints
-                continue
-
-            frame_id, frame = item
+        for item in self.pipeline.poll_outputs():
+            frame_id, frame, records = item
             widget = self.camera_feed_widgets.get(frame_id)
             if widget:
                 widget.update_frame(frame)
 
+            if self.stream_server is not None:
+                detections = [{'timestamp': timestamp, 'class': class_name, 'confidence': conf, 'box': list(box)}
+                              for timestamp, _, class_name, conf, box in records]
+                self.stream_server.publish(frame_id, frame, detections)
+
     def closeEvent(self, event):
         print("Closing application. Terminating all processes...")
-        # Terminate worker processes
-        for camera_id, stop_event in self.camera_stop_events.items():
-            stop_event.set() # Signal worker to stop
-            if camera_id in self.camera_processes and self.camera_processes[camera_id].is_alive():
-                self.camera_processes[camera_id].join(timeout=1) # Give it a moment to clean up
-                if self.camera_processes[camera_id].is_alive():
-                    self.camera_processes[camera_id].terminate() # Force terminate if not stopped
-        print("All worker processes terminated.")
-
-        # Terminate reader processes and unlink shared memory
-        for source, stop_event in self.reader_stop_events.items():
-            stop_event.set() # Signal reader to stop
-            if source in self.reader_processes and self.reader_processes[source].is_alive():
-                self.reader_processes[source].join(timeout=1) # Give it a moment to clean up
-                if self.reader_processes[source].is_alive():
-                    self.reader_processes[source].terminate() # Force terminate if not stopped
-            # Unlink shared memory
-            if source in self.shared_memories:
-                self.shared_memories[source].close()
-                self.shared_memories[source].unlink() # Unlink to release resources
-        print("All reader processes and shared memories terminated/unlinked.")
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        self.pipeline.shutdown()
 
         super().closeEvent(event)
@@ -1,21 +1,106 @@
 
+import os
 import sys
+import argparse
 import multiprocessing
 
-from PyQt5.QtWidgets import QApplication
 
-from gui.start_screen import StartScreen
-from gui.main_window import MainWindow
+def parse_args():
+    parser = argparse.ArgumentParser(description="Camera Detection System")
+    parser.add_argument("--coordinator", metavar="PROFILE",
+                        help="Run headless as a cluster coordinator, assigning the cameras of PROFILE to agents")
+    parser.add_argument("--listen", metavar="HOST:PORT", default="127.0.0.1:9000",
+                        help="Address the coordinator listens on for agents (default: 127.0.0.1:9000)")
+    parser.add_argument("--agent", metavar="HOST:PORT",
+                        help="Run headless as a detection agent connected to the coordinator at HOST:PORT")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="Number of cameras this agent can run (default: half the CPU cores)")
+    parser.add_argument("--agent-id", default=None, help="Agent name (default: hostname-pid)")
+    parser.add_argument("--token", default=os.environ.get("CAMERA_CLUSTER_TOKEN"),
+                        help="Shared secret agents present to the coordinator (default: $CAMERA_CLUSTER_TOKEN; "
+                             "a coordinator without one generates and prints a token)")
+    parser.add_argument("--thumbnails", action="store_true",
+                        help="Send thumbnail frames from the agent to the coordinator")
+    parser.add_argument("--sources-per-reader", type=int, default=0, metavar="N",
+                        help="Run camera readers as threads, N sources per reader process (default: 0, one process per source)")
+    parser.add_argument("--target-fps", type=float, default=None, metavar="FPS",
+                        help="Plan models, input sizes and inference rates so each camera reaches FPS on this machine")
+    parser.add_argument("--max-latency", type=float, default=250, metavar="MS",
+                        help="Maximum inference latency per frame for the capacity plan (default: 250)")
+    parser.add_argument("--auto-plan", action="store_true",
+                        help="Apply the capacity plan to the cameras instead of only logging recommendations")
+    return parser.parse_args()
+
+
+def make_planner(args):
+    if args.target_fps is None:
+        return None
+    from core.capacity_planner import CapacityPlanner
+    return CapacityPlanner(args.target_fps, args.max_latency, auto_assign=args.auto_plan)
+
+
+def run_gui(args):
+    from PyQt5.QtWidgets import QApplication
+
+    from gui.start_screen import StartScreen
 
-if __name__ == "__main__":
-    multiprocessing.freeze_support() # For Windows compatibility
     app = QApplication(sys.argv)
 
     start_screen = StartScreen()
     if start_screen.exec_(): # Show the start screen as a modal dialog
+        from gui.main_window import MainWindow # Loaded after the start screen is shown, so it appears sooner
         initial_configs = start_screen.get_selected_profile_config()
-        window = MainWindow(initial_configs) # Pass loaded configs to main window
+        window = MainWindow(initial_configs, args.sources_per_reader, make_planner(args)) # Pass loaded configs to main window
         window.show()
         sys.exit(app.exec_())
     else:
         sys.exit(0) # User cancelled start screen
+
+
+def run_coordinator_mode(args):
+    from core.cluster import HeadlessSink, run_coordinator, parse_address, COORDINATOR_PORT
+    from core.pipeline import CameraPipeline
+    from core.stream_server import StreamServer
+    from utils.profile_manager import load_profile
+
+    profile_configs = load_profile(args.coordinator)
+    if profile_configs is None:
+        sys.exit(1)
+
+    # The coordinator runs no cameras itself; the pipeline only hosts the event writer
+    pipeline = CameraPipeline()
+    stream_server = StreamServer()
+    try:
+        stream_server.start()
+    except OSError as e:
+        print(f"Could not start stream server on port {stream_server.port}: {e}")
+        stream_server = None
+
+    host, port = parse_address(args.listen, COORDINATOR_PORT)
+    try:
+        run_coordinator(profile_configs, host, port, HeadlessSink(pipeline.event_queue, stream_server), args.token)
+    finally:
+        if stream_server is not None:
+            stream_server.stop()
+        pipeline.shutdown()
+
+
+def run_agent_mode(args):
+    from core.cluster import run_agent, parse_address, COORDINATOR_PORT
+
+    if not args.token:
+        print("An agent needs the coordinator's token: pass --token or set CAMERA_CLUSTER_TOKEN.")
+        sys.exit(1)
+    host, port = parse_address(args.agent, COORDINATOR_PORT)
+    run_agent(host, port, args.capacity, args.agent_id, args.thumbnails, args.sources_per_reader, make_planner(args), args.token)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # For Windows compatibility
+    args = parse_args()
+    if args.coordinator:
+        run_coordinator_mode(args)
+    elif args.agent:
+        run_agent_mode(args)
+    else:
+        run_gui(args)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from core import capacity_planner
+from core.capacity_planner import CapacityPlanner, load_benchmark
+
+# Measured latencies in ms at 1 and 4 threads, as load_benchmark caches them
+BENCHMARK = {
+    'yolov8n.pt': {'latency_ms': {'1': {'320': 20.0, '640': 60.0}, '4': {'320': 8.0, '640': 20.0}}, 'rss_mb': 300.0},
+    'yolov8m.pt': {'latency_ms': {'1': {'320': 80.0, '640': 240.0}, '4': {'320': 30.0, '640': 70.0}}, 'rss_mb': 900.0},
+}
+CPUS = list(range(5)) # One reserved, four for the workers
+
+
+def _plan(target_fps, max_latency_ms, cameras=1, ram_mb=None):
+    planner = CapacityPlanner(target_fps, max_latency_ms, benchmark=BENCHMARK, cpus=CPUS, ram_mb=ram_mb)
+    return planner.plan({camera_id: {} for camera_id in range(cameras)})
+
+
+def test_plan_picks_most_expensive_option_that_fits():
+    assignments, warnings = _plan(target_fps=10, max_latency_ms=100)
+    assert warnings == []
+    assert assignments[0]['model_name'] == 'yolov8m.pt' and assignments[0]['imgsz'] == 640
+    assert assignments[0]['threads'] == 4
+    assert assignments[0]['inference_fps'] == 10
+
+
+def test_plan_splits_cores_between_cameras():
+    assignments, warnings = _plan(target_fps=10, max_latency_ms=100, cameras=2)
+    assert warnings == []
+    # Two threads each: yolov8m @ 640 is too slow, yolov8m @ 320 still fits
+    assert {a['threads'] for a in assignments.values()} == {2}
+    assert {(a['model_name'], a['imgsz']) for a in assignments.values()} == {('yolov8m.pt', 320)}
+
+
+def test_plan_respects_ram():
+    # 1000 MB * RAM_HEADROOM leaves 800 MB for the one worker: yolov8m needs 900
+    assignments, warnings = _plan(target_fps=10, max_latency_ms=100, ram_mb=1000)
+    assert warnings == []
+    assert assignments[0]['model_name'] == 'yolov8n.pt' and assignments[0]['imgsz'] == 640
+
+
+def test_plan_falls_back_to_cheapest_with_warning():
+    assignments, warnings = _plan(target_fps=200, max_latency_ms=5)
+    assert assignments[0]['model_name'] == 'yolov8n.pt' and assignments[0]['imgsz'] == 320
+    assert assignments[0]['inference_fps'] == 125 # What 8 ms per frame sustains
+    assert any("cannot reach" in warning for warning in warnings)
+
+
+def test_plan_skips_tiled_cameras():
+    planner = CapacityPlanner(10, 100, benchmark=BENCHMARK, cpus=CPUS)
+    assignments, warnings = planner.plan({0: {'enable_tiling': True}, 1: {}})
+    assert list(assignments) == [1]
+    assert any("tiled" in warning for warning in warnings)
+
+
+def _failing_benchmark(model_name, image_sizes, thread_counts, runs, result_queue):
+    result_queue.put((model_name, None, "could not load model: offline"))
+
+
+class _NoProcess:
+    def __init__(self, *args, **kwargs):
+        raise AssertionError("benchmark started for a model that failed before")
+
+
+def test_failed_benchmark_is_cached_until_refresh(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "benchmark.json")
+    monkeypatch.setattr(capacity_planner, '_benchmark_model', _failing_benchmark)
+    assert load_benchmark(['yolov8x.pt'], [320], cache_path=cache_path) == {}
+    with open(cache_path) as f:
+        assert json.load(f)['failed'] == {'yolov8x.pt': "could not load model: offline"}
+
+    with monkeypatch.context() as m:
+        m.setattr(capacity_planner.multiprocessing, 'Process', _NoProcess)
+        assert load_benchmark(['yolov8x.pt'], [320], cache_path=cache_path) == {}
+        with pytest.raises(AssertionError):
+            load_benchmark(['yolov8x.pt'], [320], refresh=True, cache_path=cache_path)
@@ -0,0 +1,91 @@
+import json
+import os
+import queue
+import threading
+
+import pytest
+
+from core import event_store
+from core.event_store import EventStore, event_writer, INDEX_SUFFIX
+
+SEGMENT_SECONDS = 60
+BASE = 1_700_000_040.0 # Start of a 60 s window
+BOX = (1.0, 2.0, 3.0, 4.0)
+
+
+def _write(store_dir, *batches):
+    """Runs the writer over the batches and lets it exit once they are written."""
+    event_queue = queue.Queue()
+    for batch in batches:
+        event_queue.put(batch)
+    stop_event = threading.Event()
+    stop_event.set() # The writer drains the queue and flushes before it exits
+    event_writer(event_queue, stop_event, store_dir, SEGMENT_SECONDS)
+
+
+def _record(offset, camera_id=0, class_name="person"):
+    return (BASE + offset, camera_id, class_name, 0.9, BOX)
+
+
+def _index_files(store_dir):
+    return sorted(f for f in os.listdir(store_dir) if f.endswith(INDEX_SUFFIX))
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return str(tmp_path / "events")
+
+
+def test_segments_rotate_at_window_boundary(store_dir):
+    _write(store_dir, [_record(10), _record(50), _record(70, class_name="car"), _record(130)])
+    assert len(_index_files(store_dir)) == 3
+
+    store = EventStore(store_dir, SEGMENT_SECONDS)
+    assert [r[0] - BASE for r in store.query(start=BASE + 40, end=BASE + 80)] == [50, 70]
+    assert store.count(class_name="car") == 1
+    assert store.count(start=BASE + 60, end=BASE + 120) == 1
+
+
+def test_late_record_gets_its_own_segment(store_dir):
+    _write(store_dir, [_record(10), _record(70)], [_record(20)]) # The second batch arrives after the rotation
+    for filename in _index_files(store_dir):
+        with open(os.path.join(store_dir, filename)) as f:
+            index = json.load(f)
+        window = event_store.segment_window(filename, SEGMENT_SECONDS)
+        assert window <= index['min_time'] and index['max_time'] < window + SEGMENT_SECONDS
+
+    store = EventStore(store_dir, SEGMENT_SECONDS)
+    assert store.count(start=BASE, end=BASE + 60) == 2
+
+
+def test_queries_skip_segments_by_name(store_dir, monkeypatch):
+    _write(store_dir, [_record(offset) for offset in range(0, 600, 30)]) # 10 windows
+    opened = []
+    original_load = json.load
+
+    def counting_load(f):
+        opened.append(os.path.basename(f.name))
+        return original_load(f)
+
+    monkeypatch.setattr(event_store.json, 'load', counting_load)
+    store = EventStore(store_dir, SEGMENT_SECONDS)
+    assert store.count(start=BASE + 120, end=BASE + 180) == 2
+    assert len(opened) == 1 # Only the index of the matching window is parsed
+
+
+def test_count_from_index_only_when_window_is_covered(store_dir, monkeypatch):
+    _write(store_dir, [_record(10, camera_id=1), _record(20, camera_id=2), _record(50, camera_id=1)])
+    store = EventStore(store_dir, SEGMENT_SECONDS)
+    reads = []
+    original_read = EventStore._read_segment
+
+    def counting_read(self, *args):
+        reads.append(args)
+        return original_read(self, *args)
+
+    monkeypatch.setattr(EventStore, '_read_segment', counting_read)
+    assert store.count(camera_id=1, start=BASE, end=BASE + 60) == 2
+    assert reads == [] # The segment lies inside the range: answered from its index
+
+    assert store.count(camera_id=1, start=BASE + 30, end=BASE + 60) == 1
+    assert len(reads) == 1 # Partly covered: the segment data is scanned
@@ -0,0 +1,29 @@
+import ast
+import os
+
+from benchmarks.import_time import REPO_ROOT
+
+
+def _parse(path):
+    with open(os.path.join(REPO_ROOT, path)) as f:
+        return ast.parse(f.read())
+
+
+def _function(tree, name):
+    return next(node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef) and node.name == name)
+
+
+def test_run_gui_matches_main_window_signature():
+    # MainWindow needs PyQt5, so the call in run_gui is checked against its source instead of by importing it
+    init = next(node for node in ast.walk(_parse("gui/main_window.py"))
+                if isinstance(node, ast.ClassDef) and node.name == "MainWindow")
+    init = _function(init, "__init__")
+    params = [arg.arg for arg in init.args.args[1:]]
+    calls = [node for node in ast.walk(_function(_parse("main.py"), "run_gui"))
+             if isinstance(node, ast.Call) and getattr(node.func, "id", None) == "MainWindow"]
+
+    assert calls, "run_gui no longer creates a MainWindow"
+    for call in calls:
+        assert len(call.args) <= len(params), f"MainWindow takes {len(params)} arguments ({', '.join(params)}), run_gui passes {len(call.args)}"
+        unknown = [kw.arg for kw in call.keywords if kw.arg not in params]
+        assert not unknown, f"MainWindow has no parameters {unknown}"
@@ -0,0 +1,28 @@
+import os
+import re
+
+import pytest
+
+from benchmarks.import_time import LIGHT_MODULES, FORBIDDEN_PACKAGES, DEFAULT_BUDGET_MS, REPO_ROOT, import_profile
+
+MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([\w.]+)'")
+
+
+def _is_third_party(module):
+    root = module.split(".")[0]
+    return not (os.path.isdir(os.path.join(REPO_ROOT, root)) or os.path.isfile(os.path.join(REPO_ROOT, root + ".py")))
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_light_module_skips_inference_stack(module):
+    total, _, packages, error = import_profile(module)
+    if error:
+        missing = MISSING_MODULE.search(error)
+        # Without PyQt5/OpenCV installed the module cannot be imported at all, so there is nothing to measure
+        if missing and _is_third_party(missing.group(1)) and missing.group(1).split(".")[0] not in FORBIDDEN_PACKAGES:
+            pytest.skip(f"{module} needs {missing.group(1)}, which is not installed")
+        pytest.fail(f"{module} failed to import: {error}")
+
+    forbidden = sorted(packages.intersection(FORBIDDEN_PACKAGES))
+    assert not forbidden, f"{module} imports {', '.join(forbidden)}"
+    assert total / 1000 <= DEFAULT_BUDGET_MS, f"{module} takes {total / 1000:.0f} ms to import (budget {DEFAULT_BUDGET_MS} ms)"
@@ -0,0 +1,56 @@
+import numpy as np
+
+from detection.tiling import tile_origins, cut_at_tile_edge, nms
+
+
+def _nms(boxes, scores, classes=None, fragments=None, **kwargs):
+    boxes = np.array(boxes, dtype=np.float32)
+    classes = np.zeros(len(boxes)) if classes is None else np.array(classes)
+    fragments = None if fragments is None else np.array(fragments, dtype=bool)
+    return nms(boxes, np.array(scores), classes, fragments=fragments, **kwargs).tolist()
+
+
+def test_tile_origins_cover_length_with_overlap():
+    origins = tile_origins(1920, 640, 128)
+    assert origins[0] == 0
+    assert origins[-1] == 1920 - 640 # Last tile flush with the edge
+    assert all(b - a <= 640 - 128 for a, b in zip(origins, origins[1:]))
+
+
+def test_tile_origins_single_tile_when_frame_fits():
+    assert tile_origins(480, 640, 128) == [0]
+    assert tile_origins(640, 640, 128) == [0]
+
+
+def test_cut_at_tile_edge_ignores_frame_border():
+    # Tile in the top-left corner of a 1280x720 frame: only its right and bottom edges are interior
+    boxes = np.array([[0, 0, 100, 100], [600, 100, 640, 200], [100, 300, 200, 360], [300, 200, 400, 300]], dtype=np.float32)
+    assert cut_at_tile_edge(boxes, (0, 0, 640, 360), (720, 1280, 3)).tolist() == [False, True, True, False]
+
+
+def test_nms_merges_duplicates_by_iou():
+    assert _nms([[0, 0, 100, 100], [5, 5, 100, 100]], [0.9, 0.8]) == [0]
+
+
+def test_nms_keeps_other_classes():
+    assert _nms([[0, 0, 100, 100], [0, 0, 100, 100]], [0.9, 0.8], classes=[0, 1]) == [0, 1]
+
+
+def test_nms_keeps_person_inside_nearer_person():
+    # A distant person whose box lies within a nearer person's box is a separate object
+    assert _nms([[0, 0, 200, 400], [50, 50, 100, 150]], [0.9, 0.8]) == [0, 1]
+    assert _nms([[0, 0, 200, 400], [50, 50, 100, 150]], [0.9, 0.8], fragments=[False, False]) == [0, 1]
+
+
+def test_nms_merges_tile_fragment_into_whole_object():
+    # The right tile sees the whole object, the left tile only the part up to its edge at x=640
+    boxes = [[600, 100, 640, 200], [600, 100, 700, 200]]
+    assert _nms(boxes, [0.9, 0.6], fragments=[True, False]) == [1]
+    assert _nms(boxes, [0.6, 0.9], fragments=[True, False]) == [1]
+
+
+def test_nms_suppression_follows_the_kept_box():
+    # The fragment scores highest and is swapped for the whole object; a duplicate of the whole
+    # object that does not overlap the fragment enough must still be suppressed
+    boxes = [[600, 100, 640, 200], [600, 100, 800, 200], [610, 100, 800, 200]]
+    assert _nms(boxes, [0.9, 0.6, 0.5], fragments=[True, False, False]) == [1]